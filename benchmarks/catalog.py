@@ -0,0 +1,133 @@
+"""search_products latency versus catalog size.
+
+Builds synthetic catalogs of increasing size and times a fixed set of
+queries against the in-memory Catalog, the SQLite FTS5 SqliteCatalog and
+the original linear scan (substring checks over every product). Also
+reports build times and how many products each query matches.
+
+    python -m benchmarks.catalog [--sizes 1000,10000,100000] [--repeat 20]
+
+`--write FILE --size N` writes a synthetic catalog of N products instead,
+for use with `run.py --catalog FILE`: a SQLite database if FILE ends in
+.sqlite or .db (streamed, so multi-million-product stores are fine),
+JSON Lines otherwise.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from model_test.catalog import Catalog, SqliteCatalog
+
+BRANDS = ["Acme", "Apex", "Nova", "Orion", "Pulse", "Vertex", "Zenith", "Lumen", "Quark", "Helix",
+          "Sony", "Samsung", "Apple", "Logi", "Anker", "Bose", "Dell", "Lenovo", "Asus", "Canon"]
+ITEMS = {
+    "electronics": ["Headphones", "Wireless Headphones", "Keyboard", "Gaming Mouse", "Laptop", "Monitor",
+                    "Smartphone", "Tablet", "Charger", "Speaker", "Webcam", "Smartwatch"],
+    "books": ["Cookbook", "Programming Book", "Science Fiction Novel", "Biography", "Travel Guide", "Atlas"],
+    "home": ["Desk Lamp", "Coffee Maker", "Blender", "Kettle", "Air Purifier", "Vacuum"],
+    "sports": ["Running Shoes", "Yoga Mat", "Water Bottle", "Tennis Racket", "Bike Helmet"],
+}
+COLOURS = ["Black", "White", "Blue", "Red", "Silver", "Green", "Grey", "Gold"]
+
+# (query, category) pairs, from very selective to very broad
+QUERIES = [
+    ("wireless headphones", ""),
+    ("apex laptop", ""),
+    ("keyboard", "electronics"),
+    ("cookbook", ""),
+    ("phone", ""),
+    ("books", ""),
+    ("", "home"),
+]
+
+
+def iter_synthetic_products(size: int, seed: int = 0) -> Iterator[tuple[str, dict]]:
+    """(name, product) for `size` distinct products, generated one at a time."""
+    rng = random.Random(seed)
+    kinds = [(category, item) for category, items in ITEMS.items() for item in items]
+    for n in range(size):
+        category, item = kinds[n % len(kinds)]
+        # The trailing number makes names unique: each kind occurs once per number
+        name = f"{rng.choice(BRANDS)} {item} {rng.choice(COLOURS)} {n // len(kinds)}"
+        yield name, {"name": name, "price": round(rng.uniform(5, 2000), 2), "category": category}
+
+
+def synthetic_products(size: int, seed: int = 0) -> dict[str, dict]:
+    """`size` distinct products, keyed by name."""
+    return dict(iter_synthetic_products(size, seed))
+
+
+def linear_scan(products: dict[str, dict], query: str = "", category: str = "") -> list[dict]:
+    """The original search_products: a substring check over every product."""
+    results = []
+    query_lower = query.lower()
+    for product in products.values():
+        if query and query_lower not in product["name"].lower() and query_lower not in product["category"].lower():
+            continue
+        if category and category.lower() != product["category"].lower():
+            continue
+        results.append(product)
+    return results
+
+
+def _median_us(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark search_products latency against catalog size")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated catalog sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per query (median reported)")
+    parser.add_argument("--limit", type=int, default=20, help="Catalog result limit")
+    parser.add_argument("--write", default=None,
+                        help="Write a synthetic catalog (.sqlite/.db or JSONL) to this file and exit")
+    parser.add_argument("--size", type=int, default=100_000, help="Products in the --write catalog")
+    args = parser.parse_args(argv)
+
+    if args.write:
+        start = time.perf_counter()
+        if Path(args.write).suffix in (".sqlite", ".db"):
+            SqliteCatalog.build(args.write, iter_synthetic_products(args.size))
+        else:
+            with open(args.write, "w") as f:
+                for _, product in iter_synthetic_products(args.size):
+                    f.write(json.dumps(product) + "\n")
+        print(f"Wrote {args.size} products to {args.write} in {time.perf_counter() - start:.1f}s")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            products = synthetic_products(size)
+            start = time.perf_counter()
+            catalog = Catalog(products, limit=args.limit)
+            build = time.perf_counter() - start
+            db_path = os.path.join(tmp, f"catalog_{size}.sqlite")
+            start = time.perf_counter()
+            SqliteCatalog.build(db_path, products.items())
+            db_build = time.perf_counter() - start
+            db = SqliteCatalog(db_path, limit=args.limit)
+            print(f"\n{size} products: index built in {build:.2f}s, SQLite store in {db_build:.2f}s "
+                  f"({os.path.getsize(db_path) / 1e6:.1f} MB)")
+            print(f"{'query':<28} {'matches':>8} {'indexed µs':>11} {'sqlite µs':>10} {'scan µs':>10}")
+            for query, category in QUERIES:
+                _, total = catalog.search(query, category)
+                indexed = _median_us(lambda: catalog.search(query, category), args.repeat)
+                sqlite = _median_us(lambda: db.search(query, category), args.repeat)
+                scan = _median_us(lambda: linear_scan(products, query, category), max(1, args.repeat // 4))
+                label = f"{query!r}" + (f" in {category}" if category else "")
+                print(f"{label:<28} {total:>8} {indexed:>11.1f} {sqlite:>10.1f} {scan:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
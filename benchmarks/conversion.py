@@ -0,0 +1,73 @@
+"""Per-round request-building cost for the native SDK clients.
+
+Grows a synthetic agent conversation one round (a tool call and its
+result) at a time and times BedrockClient/VertexAIClient._build_request
+at each length, with the incremental conversation state the agent loop
+uses and with a full conversion of the history for comparison. Uses the
+stub Bedrock runtime and Vertex SDK, so no credentials or network are
+needed.
+
+    python -m benchmarks.conversion [--rounds 40] [--repeat 200]
+"""
+import argparse
+import json
+import time
+
+from model_test.fakeserver import FakeBedrockRuntime, FakeModel, fake_vertex_sdk
+from model_test.models import Completion, ToolCallRequest
+from model_test.runner import BedrockClient, VertexAIClient
+
+
+def _round(n: int) -> list:
+    """One agent round: an assistant tool call and the tool's result."""
+    call = ToolCallRequest(id=f"call_{n}", name="add_to_cart", arguments={"product_name": "iPhone", "quantity": n})
+    result = {"success": True, "message": f"Added {n} x iPhone to cart", "cart_total": 999.99 * n}
+    return [
+        Completion(tool_calls=[call]),
+        {"role": "tool", "tool_call_id": call.id, "content": json.dumps(result)},
+    ]
+
+
+def _time_rounds(client, rounds: int, repeat: int, incremental: bool) -> list[float]:
+    """Mean microseconds spent building the request at each round."""
+    timings = []
+    for _ in range(repeat):
+        messages = [
+            {"role": "system", "content": "You are a helpful shopping assistant. Use the provided tools to help users."},
+            {"role": "user", "content": "Add some iPhones to my cart"},
+        ]
+        conversation = client.start_conversation() if incremental else None
+        for n in range(rounds):
+            start = time.perf_counter()
+            client._build_request(messages, conversation)
+            elapsed = time.perf_counter() - start
+            if len(timings) <= n:
+                timings.append(0.0)
+            timings[n] += elapsed
+            messages.extend(_round(n))
+    return [t / repeat * 1e6 for t in timings]
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark per-round request conversion for Bedrock and Vertex AI")
+    parser.add_argument("--rounds", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    model = FakeModel()
+    clients = {
+        "bedrock": BedrockClient("bench", client=FakeBedrockRuntime(model)),
+        "vertex": VertexAIClient("bench", sdk=fake_vertex_sdk(model)),
+    }
+    shown = sorted({1, 2, 5, 10, 20, args.rounds} & set(range(1, args.rounds + 1)))
+    for name, client in clients.items():
+        incremental = _time_rounds(client, args.rounds, args.repeat, incremental=True)
+        full = _time_rounds(client, args.rounds, args.repeat, incremental=False)
+        print(f"\n{name}: build time per round (µs)")
+        print(f"{'round':>6} {'incremental':>12} {'full':>10}")
+        for n in shown:
+            print(f"{n:>6} {incremental[n - 1]:>12.1f} {full[n - 1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
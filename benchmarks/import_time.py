@@ -0,0 +1,83 @@
+"""CLI start-up cost, measured with `python -X importtime`.
+
+Imports each entry point in a fresh interpreter and reports the median
+cumulative import time. The run fails (exit status 1) if an entry point
+imports a backend SDK it shouldn't (the CLI and the analysis/report paths
+import none, and constructing a runner imports only the selected
+backend's SDK), or if one that loads no SDK goes over the budget.
+
+    python -m benchmarks.import_time [--repeat 5] [--budget-ms 250]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Top-level packages of the backend SDKs
+SDKS = ("openai", "boto3", "botocore", "vertexai", "google")
+
+# Entry point -> (statement to time, SDKs it may import)
+ENTRY_POINTS = {
+    "model_test.main": ("import model_test.main", ()),
+    "analyse_batch": ("import analyse_batch", ()),
+    "runner ollama/": (
+        "from model_test.runner import TestRunner; TestRunner('', '', 'ollama/m')", ("openai",)
+    ),
+    "runner fake-bedrock/": (
+        "from model_test.runner import TestRunner; TestRunner('', '', 'fake-bedrock/m')", ()
+    ),
+    "runner fake-vertex/": (
+        "from model_test.runner import TestRunner; TestRunner('', '', 'fake-vertex/m')", ()
+    ),
+}
+
+
+def _import_profile(statement: str) -> tuple[float, set[str]]:
+    """(milliseconds spent importing, top-level packages imported) for one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True
+    )
+    total_us = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        packages.add(name.strip().split(".")[0])
+        # Only top-level imports: nested ones are already in their parent's cumulative time
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+    return total_us / 1000, packages
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Check CLI import time and that backend SDKs load lazily")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per entry point (median reported)")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="Largest acceptable import time per entry point")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'entry point':<22} {'import ms':>10}  SDKs imported")
+    for label, (statement, allowed) in ENTRY_POINTS.items():
+        timings = []
+        packages = set()
+        for _ in range(args.repeat):
+            ms, imported = _import_profile(statement)
+            timings.append(ms)
+            packages |= imported
+        median = statistics.median(timings)
+        sdks = sorted(p for p in packages if p in SDKS)
+        print(f"{label:<22} {median:>10.1f}  {', '.join(sdks) or '-'}")
+        if not allowed and median > args.budget_ms:
+            failures.append(f"{label}: {median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        unexpected = [sdk for sdk in sdks if sdk not in allowed]
+        if unexpected:
+            failures.append(f"{label}: imports {', '.join(unexpected)}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
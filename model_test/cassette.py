@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+from collections import deque
+from dataclasses import asdict
+from datetime import datetime
+
+from .models import Completion, TokenUsage
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMissError(LookupError):
+    """Raised when a replayed conversation reaches a request that was never recorded."""
+
+
+def _field(obj, name, default=None):
+    """Read a field from a dict message or an SDK/ad-hoc message object."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _canonical_message(msg) -> dict:
+    """Backend-neutral form of one chat message, used for hashing.
+
+    Tool call IDs are dropped: they are random per backend and per run, and
+    the conversation is already pinned down by the calls' names, arguments
+    and order.
+    """
+    if isinstance(msg, Completion):
+        canonical = {"role": "assistant", "content": msg.content}
+        if msg.tool_calls:
+            canonical["tool_calls"] = [
+                {"name": tc.name, "arguments": tc.arguments if tc.arguments is not None else tc.arguments_json}
+                for tc in msg.tool_calls
+            ]
+        return canonical
+    role = _field(msg, "role")
+    canonical = {"role": role, "content": _field(msg, "content") or ""}
+    tool_calls = _field(msg, "tool_calls")
+    if role == "assistant" and tool_calls:
+        calls = []
+        for tc in tool_calls:
+            function = _field(tc, "function")
+            arguments = _field(function, "arguments")
+            if isinstance(arguments, str):
+                arguments = json.loads(arguments) if arguments else {}
+            calls.append({"name": _field(function, "name"), "arguments": arguments})
+        canonical["tool_calls"] = calls
+    return canonical
+
+
+def request_key(messages, tools) -> str:
+    """Hash a request (conversation so far plus tool definitions)."""
+    payload = {"messages": [_canonical_message(m) for m in messages], "tools": tools}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _message_dict(completion: Completion) -> dict:
+    """Serialise an assistant turn from any backend to OpenAI chat format."""
+    message = completion.to_openai()
+    return {"role": "assistant", "content": message["content"], "tool_calls": message.get("tool_calls")}
+
+
+class Cassette:
+    """Gzipped JSON Lines file of recorded request/response pairs.
+
+    The first line is a header naming the recorded model and backend; each
+    following line holds one response keyed by request_key(). Entries are
+    flushed as they are written, so a cassette from an interrupted run can
+    still be replayed up to the point it stopped.
+    """
+
+    def __init__(self, path: str, model: str = "", backend: str = ""):
+        self.path = path
+        self.model = model
+        self.backend = backend
+        self._file = None
+        self._entries: dict[str, deque] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        """Open an existing cassette for replay."""
+        cassette = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if "cassette" in record:
+                        cassette.model = record.get("model", "")
+                        cassette.backend = record.get("backend", "")
+                        continue
+                    cassette._entries.setdefault(record["key"], deque()).append(record)
+            except (EOFError, json.JSONDecodeError):
+                # Truncated by an interrupted recording; keep what was flushed
+                pass
+        return cassette
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def record(self, key: str, message: Completion, usage: TokenUsage | None, ttft: float | None, llm_time: float):
+        """Append one response to the cassette."""
+        if self._file is None:
+            self._file = gzip.open(self.path, "wt", encoding="utf-8")
+            self._write({
+                "cassette": CASSETTE_VERSION,
+                "model": self.model,
+                "backend": self.backend,
+                "created": datetime.now().isoformat(),
+            })
+        self._write({
+            "key": key,
+            "message": _message_dict(message),
+            "usage": asdict(usage) if usage else None,
+            "ttft": ttft,
+            "llm_time": llm_time,
+        })
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def lookup(self, key: str) -> tuple[dict, TokenUsage | None]:
+        """Return the recorded (message dict, usage) for a request.
+
+        If the same request was recorded several times (e.g. with --runs),
+        responses are served in recording order and the last one is reused
+        once the others are exhausted.
+        """
+        entries = self._entries.get(key)
+        if not entries:
+            raise CassetteMissError(f"no recorded response for this request in {self.path}")
+        record = entries.popleft() if len(entries) > 1 else entries[0]
+        usage = TokenUsage(**record["usage"]) if record.get("usage") else None
+        return record["message"], usage
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
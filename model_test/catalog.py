@@ -0,0 +1,317 @@
+"""Indexed product catalog behind search_products.
+
+A Catalog holds products (name, price, category and any other fields)
+and builds two indexes once, when it is created:
+
+- a trigram index: every three-character substring of each lowercased
+  product name, mapped to the products whose name contains it
+- a category index: lowercased category -> products in it
+
+A query keeps the substring semantics of the original linear scan (it
+matches a product if it occurs in the name or the category), but only
+the products listed under the query's rarest trigram are checked, so the
+cost depends on how selective the query is rather than on the catalog's
+size. Queries shorter than three characters have no trigram and fall back
+to a scan.
+
+Matches are ranked (exact name, then name prefix, then a match at the
+start of a word, then anywhere in the name, then category only; shorter
+names first within a rank) and cut to the catalog's result limit.
+
+SqliteCatalog answers the same queries, with the same results, from a
+SQLite database with an FTS5 trigram index instead of the heap. The file
+is opened read-only and memory-mapped, so worker processes running
+against the same multi-million-product catalog share its pages through
+the OS page cache instead of each building an index.
+"""
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from collections.abc import Iterable
+from pathlib import Path
+from urllib.parse import quote
+
+# Rank of each kind of match; lower is better
+_EXACT, _PREFIX, _WORD, _NAME, _CATEGORY = range(5)
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class Catalog:
+    """Products with a trigram index on their names and a category index.
+
+    `limit` is the most results a search returns (None for all of them);
+    `ranked=False` returns matches in catalog order instead of ranking
+    them, as the original scan did.
+    """
+
+    def __init__(self, products: dict[str, dict], limit: int | None = 20, ranked: bool = True):
+        self.products = products
+        self.limit = limit
+        self.ranked = ranked
+        self._records = list(products.values())
+        self._names = [p["name"].lower() for p in self._records]
+        self._categories = [p["category"].lower() for p in self._records]
+
+        trigrams: dict[str, array] = {}
+        for i, name in enumerate(self._names):
+            for gram in _trigrams(name):
+                postings = trigrams.get(gram)
+                if postings is None:
+                    postings = trigrams[gram] = array("I")
+                postings.append(i)
+        self._trigrams = trigrams
+
+        categories: dict[str, array] = {}
+        for i, category in enumerate(self._categories):
+            categories.setdefault(category, array("I")).append(i)
+        self._by_category = categories
+
+    @classmethod
+    def from_file(cls, path: str, limit: int | None = 20) -> "Catalog":
+        """Load a catalog from JSON or JSON Lines.
+
+        A JSON object maps product keys to products (the layout of
+        tools.PRODUCTS); a JSON list or a .jsonl file of products is keyed
+        by product name. Every product needs "name", "price" and "category".
+        """
+        with open(path) as f:
+            if Path(path).suffix == ".jsonl":
+                data = [json.loads(line) for line in f if line.strip()]
+            else:
+                data = json.load(f)
+        products = data if isinstance(data, dict) else {p["name"]: p for p in data}
+        for key, product in products.items():
+            missing = [name for name in ("name", "price", "category") if name not in product]
+            if missing:
+                raise ValueError(f"{path}: product {key!r} is missing {', '.join(missing)}")
+        return cls(products, limit=limit)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def price(self, key: str) -> float:
+        """Price of the product with this key, or 0 if there is none."""
+        return self.products.get(key, {}).get("price", 0)
+
+    def search(self, query: str = "", category: str = "") -> tuple[list[dict], int]:
+        """(up to `limit` best matches, number of matches).
+
+        `query` matches a product whose name or category contains it;
+        `category`, if given, must equal the product's category. Both are
+        case-insensitive.
+        """
+        query = query.lower()
+        category = category.lower()
+        if category:
+            candidates = self._by_category.get(category, ())
+            if query:
+                # Check whichever of the two candidate lists is shorter
+                by_query = self._query_candidates(query)
+                if len(by_query) < len(candidates):
+                    candidates = [i for i in by_query if self._categories[i] == category]
+        elif query:
+            candidates = self._query_candidates(query)
+        else:
+            candidates = range(len(self._records))
+
+        if query:
+            matches = [(rank, i) for i in candidates if (rank := self._rank(query, i)) is not None]
+        else:
+            matches = [(_NAME, i) for i in candidates]
+        total = len(matches)
+
+        limit = self.limit
+        if not self.ranked:
+            matches.sort(key=lambda m: m[1])
+            chosen = matches if limit is None else matches[:limit]
+        else:
+            key = lambda m: (m[0], len(self._names[m[1]]), m[1])
+            chosen = sorted(matches, key=key) if limit is None else heapq.nsmallest(limit, matches, key=key)
+        return [self._records[i] for _, i in chosen], total
+
+    def _query_candidates(self, query: str):
+        """Indexes of the products a query could match (a superset; _rank checks each one)."""
+        grams = _trigrams(query)
+        if not grams:
+            return range(len(self._records))
+        # Products in a category the query occurs in match whatever their name
+        in_categories = [postings for name, postings in self._by_category.items() if query in name]
+        postings = [self._trigrams.get(gram, ()) for gram in grams]
+        rarest = min(postings, key=len)
+        if in_categories:
+            return sorted(set(rarest).union(*in_categories))
+        return rarest
+
+    def _rank(self, query: str, i: int) -> int | None:
+        """How well product `i` matches a (lowercased) query, or None if it doesn't."""
+        name = self._names[i]
+        position = name.find(query)
+        if position < 0:
+            return _CATEGORY if query in self._categories[i] else None
+        if position == 0:
+            return _EXACT if len(name) == len(query) else _PREFIX
+        return _WORD if not name[position - 1].isalnum() else _NAME
+
+
+# SQL version of Catalog._rank, for a product whose name contains query :q
+# at `pos` (0 if only its category matches)
+_SQL_RANK = f"""
+    CASE
+        WHEN pos = 0 THEN {_CATEGORY}
+        WHEN pos = 1 THEN (CASE WHEN length(name_lower) = length(:q) THEN {_EXACT} ELSE {_PREFIX} END)
+        WHEN substr(name_lower, pos - 1, 1) NOT GLOB '[a-z0-9]' THEN {_WORD}
+        ELSE {_NAME}
+    END
+"""
+
+
+class SqliteCatalog:
+    """A catalog stored in a SQLite database built by `SqliteCatalog.build`.
+
+    Interchangeable with Catalog. Each thread gets its own read-only
+    connection.
+    """
+
+    def __init__(self, path: str, limit: int | None = 20, ranked: bool = True):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.limit = limit
+        self.ranked = ranked
+        # immutable: the file never changes while tests run, so SQLite can
+        # skip locking and share it freely between processes
+        self._uri = f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1"
+        self._mmap_size = os.path.getsize(path)
+        self._local = threading.local()
+        conn = self._conn()
+        self._size = conn.execute("SELECT count(*) FROM products").fetchone()[0]
+        self._categories = [row[0] for row in conn.execute("SELECT DISTINCT category_lower FROM products")]
+
+    @classmethod
+    def build(cls, path: str, products: Iterable[tuple[str, dict]], batch_size: int = 10_000) -> int:
+        """Write (key, product) pairs to a new catalog database at `path`; returns the product count.
+
+        Products are streamed in batches, so catalogs far larger than
+        memory can be built. An existing file is replaced once the new
+        one is complete.
+        """
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("""
+            CREATE TABLE products (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                name_lower TEXT NOT NULL,
+                category_lower TEXT NOT NULL,
+                price REAL NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        count = 0
+        rows = []
+        for key, product in products:
+            missing = [name for name in ("name", "price", "category") if name not in product]
+            if missing:
+                conn.close()
+                os.remove(tmp_path)
+                raise ValueError(f"product {key!r} is missing {', '.join(missing)}")
+            rows.append((key, product["name"].lower(), product["category"].lower(), product["price"], json.dumps(product)))
+            if len(rows) >= batch_size:
+                conn.executemany("INSERT INTO products (key, name_lower, category_lower, price, data) VALUES (?, ?, ?, ?, ?)", rows)
+                count += len(rows)
+                rows = []
+        conn.executemany("INSERT INTO products (key, name_lower, category_lower, price, data) VALUES (?, ?, ?, ?, ?)", rows)
+        count += len(rows)
+        conn.execute("CREATE INDEX products_category ON products (category_lower)")
+        conn.execute("""
+            CREATE VIRTUAL TABLE product_names
+            USING fts5(name_lower, content='products', content_rowid='id', tokenize='trigram')
+        """)
+        conn.execute("INSERT INTO product_names (product_names) VALUES ('rebuild')")
+        conn.commit()
+        conn.execute("VACUUM")
+        conn.close()
+        os.replace(tmp_path, path)
+        return count
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True)
+            conn.execute(f"PRAGMA mmap_size = {self._mmap_size}")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._size
+
+    def price(self, key: str) -> float:
+        """Price of the product with this key, or 0 if there is none."""
+        row = self._conn().execute("SELECT price FROM products WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def search(self, query: str = "", category: str = "") -> tuple[list[dict], int]:
+        """(up to `limit` best matches, number of matches), as Catalog.search."""
+        query = query.lower()
+        category = category.lower()
+        conditions = []
+        params: dict = {"q": query}
+        fts_only = False
+        if query:
+            if len(query) >= 3:
+                # A quoted phrase of trigrams matches names containing the query
+                fts = "SELECT rowid FROM product_names WHERE product_names MATCH :phrase"
+                match = f"id IN ({fts})"
+                params["phrase"] = '"' + query.replace('"', '""') + '"'
+            else:
+                match = "instr(name_lower, :q) > 0"
+            in_categories = [name for name in self._categories if query in name]
+            if in_categories:
+                params.update({f"c{i}": name for i, name in enumerate(in_categories)})
+                placeholders = ", ".join(f":c{i}" for i in range(len(in_categories)))
+                match = f"({match} OR category_lower IN ({placeholders}))"
+            fts_only = len(query) >= 3 and not in_categories and not category
+            conditions.append(match)
+        if category:
+            conditions.append("category_lower = :category")
+            params["category"] = category
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        if not self.ranked:
+            order = "id"
+        elif query:
+            order = f"{_SQL_RANK}, length(name_lower), id"
+        else:
+            order = "length(name_lower), id"
+        params["limit"] = -1 if self.limit is None else self.limit
+
+        conn = self._conn()
+        # Counting in the FTS index alone skips a lookup per match
+        count = f"SELECT count(*) FROM ({fts})" if fts_only else f"SELECT count(*) FROM products {where}"
+        total = conn.execute(count, params).fetchone()[0]
+        # Order ids first and fetch the (larger) product data for the chosen few
+        ids = [row[0] for row in conn.execute(f"""
+            SELECT id FROM (SELECT id, name_lower, instr(name_lower, :q) AS pos FROM products {where})
+            ORDER BY {order} LIMIT :limit
+        """, params)]
+        if not ids:
+            return [], total
+        data = dict(conn.execute(f"SELECT id, data FROM products WHERE id IN ({', '.join('?' * len(ids))})", ids))
+        return [json.loads(data[i]) for i in ids], total
+
+
+def load_catalog(path: str, limit: int | None = 20) -> Catalog | SqliteCatalog:
+    """The catalog in a file: a SQLite database (.sqlite, .db) or JSON/JSONL."""
+    if Path(path).suffix in (".sqlite", ".db"):
+        return SqliteCatalog(path, limit=limit)
+    return Catalog.from_file(path, limit=limit)
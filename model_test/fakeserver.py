@@ -0,0 +1,558 @@
+"""Local stand-in model for exercising the harness without a GPU or network.
+
+Serves scripted tool calls for each test case in config/test_cases.json:
+each round returns the next call of the test's first expected variant (in
+declaration order, optional steps included), then a final text answer. Latency, decode rate and faults (429s, stalls that end
+in a gateway timeout, malformed tool-call JSON) are set by a FakeProfile.
+
+Three front ends share one FakeModel:
+- an OpenAI-compatible HTTP server (/v1/chat/completions, with SSE
+  streaming), used by the fake/ prefix or standalone via
+  `python -m model_test.fakeserver` in place of llama.cpp/Ollama
+- FakeBedrockRuntime, a stub boto3 bedrock-runtime client (fake-bedrock/)
+- fake_vertex_sdk(), stub vertexai SDK entry points (fake-vertex/)
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Arguments for expected steps that accept any arguments ("arguments": null)
+# but whose tool needs some to run
+WILDCARD_ARGUMENTS = {"add_to_cart": {"product_name": "Wireless Headphones"}}
+
+
+@dataclass
+class FakeProfile:
+    """Latency and fault settings for the fake model."""
+    test_cases: str = "config/test_cases.json"
+    # Time before the first token; sampled from `distribution`
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    distribution: str = "uniform"
+    # Decode rate for completion tokens; 0 means instant
+    tokens_per_sec: float = 50.0
+    # Per-request fault probabilities
+    throttle_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_s: float = 5.0
+    malformed_rate: float = 0.0
+    seed: int | None = None
+
+    @classmethod
+    def from_file(cls, path: str) -> "FakeProfile":
+        """Load a profile from a JSON object of FakeProfile fields."""
+        with open(path) as f:
+            data = json.load(f)
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown fake profile field(s): {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (4 characters per token)."""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+class FakeModel:
+    """Scripted responses, latency sampling and fault injection."""
+
+    def __init__(self, profile: FakeProfile | None = None):
+        self.profile = profile or FakeProfile()
+        if self.profile.distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {self.profile.distribution!r}; use one of {DISTRIBUTIONS}")
+        with open(self.profile.test_cases) as f:
+            cases = json.load(f)
+        self.scripts = {
+            tc["prompt"]: (tc["expected_tools_variants"][0]["tools"] if tc["expected_tools_variants"] else [])
+            for tc in cases
+        }
+        # Request handlers run on several threads; random.Random is not thread-safe
+        self._random = random.Random(self.profile.seed)
+        self._lock = threading.Lock()
+
+    def _uniform(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def fault(self) -> str | None:
+        """Pick the fault for one request: "throttle", "timeout" or None."""
+        roll = self._uniform()
+        if roll < self.profile.throttle_rate:
+            return "throttle"
+        if roll < self.profile.throttle_rate + self.profile.timeout_rate:
+            return "timeout"
+        return None
+
+    def first_token_delay(self) -> float:
+        """Seconds before the first token, from the configured distribution."""
+        mean = self.profile.latency_ms / 1000
+        jitter = self.profile.jitter_ms / 1000
+        with self._lock:
+            rng = self._random
+            if self.profile.distribution == "fixed":
+                delay = mean
+            elif self.profile.distribution == "uniform":
+                delay = rng.uniform(mean - jitter, mean + jitter)
+            elif self.profile.distribution == "exponential":
+                delay = rng.expovariate(1 / mean) if mean > 0 else 0.0
+            else:
+                # Parameterised so the distribution's mean is `mean`
+                sigma = jitter / mean if mean > 0 else 0.0
+                delay = rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0.0
+        return max(delay, 0.0)
+
+    def token_delay(self) -> float:
+        """Seconds per decoded token."""
+        return 1 / self.profile.tokens_per_sec if self.profile.tokens_per_sec > 0 else 0.0
+
+    def turn(self, prompt: str, tool_results: int, malformed: bool = True) -> dict:
+        """Next assistant turn for a conversation.
+
+        Returns {"content": str | None, "tool_calls": [{"id", "name",
+        "arguments"}]}, where arguments is JSON text that may be
+        deliberately truncated when malformed output is injected.
+        `malformed=False` never truncates it, for APIs that return
+        arguments as structured data.
+        """
+        if prompt not in self.scripts and "EXPECTED TOOL CALL PATTERNS" in prompt:
+            return {"content": self._judge_reply(prompt), "tool_calls": []}
+        script = self.scripts.get(prompt, [])
+        if tool_results >= len(script):
+            return {"content": "Done." if script else "I can help with that.", "tool_calls": []}
+        call = script[tool_results]
+        arguments = json.dumps(call.get("arguments") or WILDCARD_ARGUMENTS.get(call["name"], {}))
+        if malformed and self._uniform() < self.profile.malformed_rate:
+            arguments = arguments[: max(len(arguments) // 2, 1)]
+        return {
+            "content": None,
+            "tool_calls": [{"id": f"call_{uuid.uuid4().hex[:24]}", "name": call["name"], "arguments": arguments}],
+        }
+
+    @staticmethod
+    def _judge_reply(prompt: str) -> str:
+        """Accept every case of an LLM-judge prompt, so fake/ can stand in as --judge-model."""
+        verdict = {"success": True, "matched_variant": "", "reasoning": "Fake judge accepts every tool path."}
+        cases = prompt.count("=== CASE ")
+        if cases:
+            return json.dumps([{"case": n, **verdict} for n in range(1, cases + 1)])
+        return json.dumps(verdict)
+
+
+def _turn_text(turn: dict) -> str:
+    return turn["content"] or "".join(tc["name"] + tc["arguments"] for tc in turn["tool_calls"])
+
+
+def _chunks(text: str, size: int = 4):
+    """Split text into roughly one-token pieces."""
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+# OpenAI-compatible HTTP server
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._send_json(200, {"object": "list", "data": [{"id": "fake", "object": "model"}]})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        model = self.server.model
+
+        fault = model.fault()
+        if fault == "throttle":
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                            {"Retry-After": "1"})
+            return
+        if fault == "timeout":
+            time.sleep(model.profile.timeout_s)
+            self._send_json(504, {"error": {"message": "Upstream timed out", "type": "timeout"}})
+            return
+
+        messages = body.get("messages", [])
+        prompt = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+        turn = model.turn(prompt, sum(1 for m in messages if m.get("role") == "tool"))
+        usage = {
+            "prompt_tokens": count_tokens(json.dumps(messages)),
+            "completion_tokens": count_tokens(_turn_text(turn)),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        # Like llama.cpp: with cache_prompt, the tools and system prompt are
+        # reused from the previous request and reported in timings.cache_n
+        timings = None
+        if body.get("cache_prompt"):
+            prefix = json.dumps([body.get("tools"), messages[:1]], sort_keys=True)
+            with self.server.lock:
+                hit = prefix in self.server.cached_prefixes
+                self.server.cached_prefixes.add(prefix)
+            timings = {"cache_n": count_tokens(json.dumps(messages[:1])) if hit else 0}
+
+        time.sleep(model.first_token_delay())
+        if body.get("stream"):
+            self._stream(body, turn, usage, timings)
+            return
+
+        time.sleep(model.token_delay() * usage["completion_tokens"])
+        message = {"role": "assistant", "content": turn["content"]}
+        if turn["tool_calls"]:
+            message["tool_calls"] = [
+                {"id": tc["id"], "type": "function", "function": {"name": tc["name"], "arguments": tc["arguments"]}}
+                for tc in turn["tool_calls"]
+            ]
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if turn["tool_calls"] else "stop",
+            }],
+            "usage": usage,
+            **({"timings": timings} if timings else {}),
+        })
+
+    def _stream(self, body: dict, turn: dict, usage: dict, timings: dict | None = None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+        }
+        delay = self.server.model.token_delay()
+
+        def send(choices, **extra):
+            self.wfile.write(b"data: " + json.dumps({**base, "choices": choices, **extra}).encode() + b"\n\n")
+            self.wfile.flush()
+
+        if turn["tool_calls"]:
+            for index, tc in enumerate(turn["tool_calls"]):
+                send([{"index": 0, "delta": {"role": "assistant", "tool_calls": [{
+                    "index": index, "id": tc["id"], "type": "function",
+                    "function": {"name": tc["name"], "arguments": ""},
+                }]}}])
+                for piece in _chunks(tc["arguments"]):
+                    time.sleep(delay)
+                    send([{"index": 0, "delta": {"tool_calls": [{"index": index, "function": {"arguments": piece}}]}}])
+        else:
+            for piece in _chunks(turn["content"]):
+                send([{"index": 0, "delta": {"content": piece}}])
+                time.sleep(delay)
+        send([{"index": 0, "delta": {}, "finish_reason": "tool_calls" if turn["tool_calls"] else "stop"}],
+             **({"timings": timings} if timings else {}))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeServer(ThreadingHTTPServer):
+    """OpenAI-compatible chat completions server backed by a FakeModel."""
+    daemon_threads = True
+
+    def __init__(self, model: FakeModel, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.model = model
+        self.cached_prefixes = set()
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_server(model: FakeModel, host: str = "127.0.0.1", port: int = 0) -> FakeServer:
+    """Start a FakeServer on a daemon thread (port 0 picks a free port)."""
+    server = FakeServer(model, host, port)
+    threading.Thread(target=server.serve_forever, name="fake-server", daemon=True).start()
+    return server
+
+
+# Bedrock stub
+
+def _bedrock_error(code: str, message: str, operation: str):
+    from botocore.exceptions import ClientError
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class FakeBedrockRuntime:
+    """Stub of the boto3 bedrock-runtime client's converse/converse_stream.
+
+    Honours cachePoint blocks: the first request with a given tools/system
+    prefix reports it as a cache write, later ones as cache reads.
+    """
+
+    def __init__(self, model: FakeModel):
+        self.model = model
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    def _cache_usage(self, kwargs: dict) -> dict:
+        tools = kwargs.get("toolConfig", {}).get("tools", [])
+        system = kwargs.get("system", [])
+        if not any("cachePoint" in block for block in tools + system):
+            return {}
+        prefix = json.dumps([tools, system], sort_keys=True)
+        with self._lock:
+            hit = prefix in self._cached_prefixes
+            self._cached_prefixes.add(prefix)
+        return {"cacheReadInputTokens" if hit else "cacheWriteInputTokens": count_tokens(prefix)}
+
+    def _turn(self, operation: str, messages: list[dict], kwargs: dict) -> tuple[dict, dict]:
+        fault = self.model.fault()
+        if fault == "throttle":
+            raise _bedrock_error("ThrottlingException", "Too many requests, please wait before trying again.", operation)
+        if fault == "timeout":
+            time.sleep(self.model.profile.timeout_s)
+            raise _bedrock_error("ModelTimeoutException", "Model has timed out in processing the request.", operation)
+
+        prompt = next(
+            (block["text"] for m in messages if m["role"] == "user" for block in m["content"] if "text" in block), ""
+        )
+        tool_results = sum(1 for m in messages for block in m["content"] if "toolResult" in block)
+        turn = self.model.turn(prompt, tool_results)
+        usage = {
+            "inputTokens": count_tokens(json.dumps(messages, default=str)),
+            "outputTokens": count_tokens(_turn_text(turn)),
+            **self._cache_usage(kwargs),
+        }
+        usage["totalTokens"] = (usage["inputTokens"] + usage["outputTokens"]
+                                + usage.get("cacheReadInputTokens", 0) + usage.get("cacheWriteInputTokens", 0))
+        return turn, usage
+
+    def converse(self, modelId: str, messages: list[dict], **kwargs) -> dict:
+        turn, usage = self._turn("Converse", messages, kwargs)
+        time.sleep(self.model.first_token_delay() + self.model.token_delay() * usage["outputTokens"])
+        content = []
+        if turn["content"]:
+            content.append({"text": turn["content"]})
+        for tc in turn["tool_calls"]:
+            try:
+                tool_input = json.loads(tc["arguments"])
+            except json.JSONDecodeError:
+                # Converse returns parsed input; pass malformed JSON through as text
+                tool_input = tc["arguments"]
+            content.append({"toolUse": {"toolUseId": tc["id"], "name": tc["name"], "input": tool_input}})
+        return {
+            "output": {"message": {"role": "assistant", "content": content}},
+            "stopReason": "tool_use" if turn["tool_calls"] else "end_turn",
+            "usage": usage,
+        }
+
+    def converse_stream(self, modelId: str, messages: list[dict], **kwargs) -> dict:
+        turn, usage = self._turn("ConverseStream", messages, kwargs)
+        delay = self.model.token_delay()
+
+        def events():
+            time.sleep(self.model.first_token_delay())
+            yield {"messageStart": {"role": "assistant"}}
+            if turn["content"]:
+                for piece in _chunks(turn["content"]):
+                    yield {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": piece}}}
+                    time.sleep(delay)
+                yield {"contentBlockStop": {"contentBlockIndex": 0}}
+            for index, tc in enumerate(turn["tool_calls"]):
+                yield {"contentBlockStart": {"contentBlockIndex": index, "start": {
+                    "toolUse": {"toolUseId": tc["id"], "name": tc["name"]}
+                }}}
+                for piece in _chunks(tc["arguments"]):
+                    time.sleep(delay)
+                    yield {"contentBlockDelta": {"contentBlockIndex": index, "delta": {"toolUse": {"input": piece}}}}
+                yield {"contentBlockStop": {"contentBlockIndex": index}}
+            yield {"messageStop": {"stopReason": "tool_use" if turn["tool_calls"] else "end_turn"}}
+            yield {"metadata": {"usage": usage, "metrics": {"latencyMs": 0}}}
+
+        return {"stream": events()}
+
+
+# Vertex AI stub
+
+class _Part:
+    def __init__(self, text: str = "", function_call=None, function_response=None):
+        self.text = text
+        self.function_call = function_call
+        self.function_response = function_response
+
+    @classmethod
+    def from_text(cls, text: str) -> "_Part":
+        return cls(text=text)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "_Part":
+        call = data["function_call"]
+        return cls(function_call=SimpleNamespace(name=call["name"], args=call.get("args") or {}))
+
+    @classmethod
+    def from_function_response(cls, name: str, response: dict) -> "_Part":
+        return cls(function_response=SimpleNamespace(name=name, response=response))
+
+
+class _Content:
+    def __init__(self, role: str, parts: list[_Part]):
+        self.role = role
+        self.parts = parts
+
+
+def _vertex_response(parts: list[_Part], usage_metadata=None):
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(role="model", parts=parts))],
+        usage_metadata=usage_metadata,
+    )
+
+
+def fake_vertex_sdk(model: FakeModel) -> SimpleNamespace:
+    """Stub vertexai SDK entry points for VertexAIClient(sdk=...).
+
+    Throttling and timeouts raise google.api_core exceptions, so injecting
+    them needs google-api-core installed. Gemini returns function-call
+    arguments as structured data, so malformed JSON is not injected here.
+    """
+
+    class GenerativeModel:
+        def __init__(self, model_name: str, system_instruction: str | None = None):
+            self.model_name = model_name
+            self.system_instruction = system_instruction
+
+        def _turn(self, contents: list[_Content]):
+            fault = model.fault()
+            if fault:
+                from google.api_core import exceptions as google_exceptions
+                if fault == "throttle":
+                    raise google_exceptions.ResourceExhausted("Quota exceeded")
+                time.sleep(model.profile.timeout_s)
+                raise google_exceptions.DeadlineExceeded("Deadline exceeded")
+
+            prompt = next((p.text for c in contents if c.role == "user" for p in c.parts if p.text), "")
+            tool_results = sum(1 for c in contents for p in c.parts if p.function_response)
+            turn = model.turn(prompt, tool_results, malformed=False)
+            if turn["tool_calls"]:
+                parts = [
+                    _Part(function_call=SimpleNamespace(name=tc["name"], args=json.loads(tc["arguments"])))
+                    for tc in turn["tool_calls"]
+                ]
+            else:
+                parts = [_Part(text=turn["content"])]
+            usage = SimpleNamespace(
+                prompt_token_count=count_tokens(json.dumps([[p.text for p in c.parts] for c in contents])),
+                candidates_token_count=count_tokens(_turn_text(turn)),
+                cached_content_token_count=0,
+            )
+            return parts, usage
+
+        def generate_content(self, contents, tools=None, stream=False, generation_config=None):
+            parts, usage = self._turn(contents)
+            time.sleep(model.first_token_delay() + model.token_delay() * usage.candidates_token_count)
+            if stream:
+                return iter([_vertex_response(parts, usage)])
+            return _vertex_response(parts, usage)
+
+        async def generate_content_async(self, contents, tools=None, stream=False, generation_config=None):
+            parts, usage = self._turn(contents)
+            if not stream:
+                await asyncio.sleep(model.first_token_delay() + model.token_delay() * usage.candidates_token_count)
+                return _vertex_response(parts, usage)
+
+            async def chunks():
+                await asyncio.sleep(model.first_token_delay())
+                for part in parts:
+                    if part.text:
+                        for piece in _chunks(part.text):
+                            yield _vertex_response([_Part(text=piece)])
+                            await asyncio.sleep(model.token_delay())
+                    else:
+                        await asyncio.sleep(model.token_delay() * count_tokens(json.dumps(part.function_call.args)))
+                        yield _vertex_response([part])
+                yield _vertex_response([], usage)
+
+            return chunks()
+
+    return SimpleNamespace(
+        init=lambda **kwargs: None,
+        GenerativeModel=GenerativeModel,
+        Content=_Content,
+        Part=_Part,
+        FunctionDeclaration=lambda **kwargs: SimpleNamespace(**kwargs),
+        Tool=lambda function_declarations: SimpleNamespace(function_declarations=function_declarations),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server for harness testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--profile", default=None, help="JSON file of FakeProfile fields")
+    parser.add_argument("--config", default=None, help="Test cases to script responses from (default: config/test_cases.json)")
+    parser.add_argument("--latency-ms", type=float, default=None, help="Mean time to first token in ms")
+    parser.add_argument("--jitter-ms", type=float, default=None, help="Latency spread in ms (uniform half-width, lognormal sd)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default=None)
+    parser.add_argument("--tokens-per-sec", type=float, default=None, help="Decode rate; 0 for instant")
+    parser.add_argument("--throttle-rate", type=float, default=None, help="Fraction of requests answered with 429")
+    parser.add_argument("--timeout-rate", type=float, default=None, help="Fraction of requests that stall, then 504")
+    parser.add_argument("--timeout-s", type=float, default=None, help="Stall length for timeouts in seconds")
+    parser.add_argument("--malformed-rate", type=float, default=None, help="Fraction of tool calls with truncated JSON")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    profile = FakeProfile.from_file(args.profile) if args.profile else FakeProfile()
+    overrides = {
+        "test_cases": args.config,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "distribution": args.distribution,
+        "tokens_per_sec": args.tokens_per_sec,
+        "throttle_rate": args.throttle_rate,
+        "timeout_rate": args.timeout_rate,
+        "timeout_s": args.timeout_s,
+        "malformed_rate": args.malformed_rate,
+        "seed": args.seed,
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            setattr(profile, name, value)
+
+    server = FakeServer(FakeModel(profile), args.host, args.port)
+    print(f"🧪 Fake model server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .models import JudgeVerdict, ToolCall
+from .paths import step_constraints
+
+
+def judge_key(
+    prompt: str,
+    actual_calls: list[ToolCall],
+    expected_variants: list,
+    judge_model: str,
+    prompt_version: int,
+) -> str:
+    """Content hash of everything that determines a judge verdict."""
+    payload = {
+        "prompt": prompt,
+        "actual": [{"name": c.tool_name, "arguments": c.arguments} for c in actual_calls],
+        "expected": [
+            {
+                "name": v.name,
+                "description": v.description,
+                "tools": [{"name": t.name, "arguments": t.arguments, **step_constraints(t)} for t in v.tools],
+            }
+            for v in expected_variants
+        ],
+        "judge_model": judge_model,
+        "prompt_version": prompt_version,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class JudgeCache:
+    """SQLite store of LLM-judge verdicts with LRU eviction.
+
+    Safe to share between threads (the judge runs off the event loop).
+    With `refresh` set, lookups always miss but new verdicts are still
+    stored, replacing the old ones.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10_000, refresh: bool = False):
+        self.path = path
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                judge_model TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                matched_variant TEXT NOT NULL,
+                reasoning TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> JudgeVerdict | None:
+        """Return the cached verdict for `key` (marking it recently used), or None."""
+        with self._lock:
+            row = None
+            if not self.refresh:
+                row = self._conn.execute(
+                    "SELECT judge_model, success, matched_variant, reasoning FROM verdicts WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        judge_model, success, matched_variant, reasoning = row
+        return JudgeVerdict(
+            success=bool(success),
+            matched_variant=matched_variant,
+            reasoning=reasoning,
+            judge_model=judge_model,
+            cache="hit",
+        )
+
+    def put(self, key: str, verdict: JudgeVerdict):
+        """Store a verdict, evicting the least recently used beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, verdict.judge_model, int(verdict.success), verdict.matched_variant, verdict.reasoning, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,253 @@
+"""Sustained-load benchmark: how an endpoint behaves as load increases.
+
+Replays the agent loops from the test cases (cycling through them) against
+any backend TestRunner supports, either open-loop (new conversations arrive
+as a Poisson process at a target rate, regardless of how many are still in
+flight) or closed-loop (a fixed number of conversations always in flight).
+Each load step runs for a fixed duration, then waits for in-flight
+conversations to finish. Tool-path matching and the LLM judge are skipped:
+only latency, throughput and errors are measured.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from .catalog import load_catalog
+from .fakeserver import FakeProfile
+from .main import _captured_output, _console_buffering, load_test_cases, print_usage, wait_for_backend
+from .models import TestCase
+from .ratelimit import RateLimitConfig
+from .runner import TestRunner
+
+
+@dataclass
+class LoadStep:
+    """Results for one load level."""
+    mode: str  # "rate" (open-loop) or "concurrency" (closed-loop)
+    target: float
+    duration: float = 0.0
+    conversations: int = 0
+    errors: int = 0
+    requests: int = 0
+    round_latencies: list[float] = field(default_factory=list)
+    conversation_latencies: list[float] = field(default_factory=list)
+    error_messages: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def requests_per_sec(self) -> float:
+        return self.requests / self.duration if self.duration else 0.0
+
+    @property
+    def conversations_per_sec(self) -> float:
+        completed = self.conversations - self.errors
+        return completed / self.duration if self.duration else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.conversations if self.conversations else 0.0
+
+    def label(self) -> str:
+        return f"{self.target:g}/s" if self.mode == "rate" else f"{self.target:g} in flight"
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    """Percentile with linear interpolation between closest ranks."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def _percentiles(values: list[float]) -> dict[str, float | None]:
+    return {f"p{p}": percentile(values, p) for p in (50, 90, 99)}
+
+
+async def _conversation(runner: TestRunner, test_case: TestCase, step: LoadStep):
+    """Run one agent conversation and record its timings into `step`."""
+    step.conversations += 1
+    start = time.perf_counter()
+    # Discard the runner's per-round console output
+    with _captured_output():
+        response, _, error = await runner.run_agent_test_async(test_case)
+    elapsed = time.perf_counter() - start
+
+    if response.stop_reason == "error":
+        step.errors += 1
+        step.error_messages[error] = step.error_messages.get(error, 0) + 1
+        return
+    step.requests += response.llm_requests
+    step.round_latencies.extend(m.llm_time for m in response.rounds)
+    step.conversation_latencies.append(elapsed)
+
+
+async def run_open_loop(runner: TestRunner, test_cases: list[TestCase], rate: float, duration: float) -> LoadStep:
+    """Start conversations as a Poisson process at `rate` per second."""
+    step = LoadStep(mode="rate", target=rate)
+    cases = itertools.cycle(test_cases)
+    tasks = []
+    start = time.perf_counter()
+    next_arrival = start
+    while True:
+        next_arrival += random.expovariate(rate)
+        if next_arrival - start >= duration:
+            break
+        await asyncio.sleep(max(next_arrival - time.perf_counter(), 0))
+        tasks.append(asyncio.create_task(_conversation(runner, next(cases), step)))
+    await asyncio.gather(*tasks)
+    step.duration = time.perf_counter() - start
+    return step
+
+
+async def run_closed_loop(runner: TestRunner, test_cases: list[TestCase], concurrency: int, duration: float) -> LoadStep:
+    """Keep `concurrency` conversations in flight until `duration` elapses."""
+    step = LoadStep(mode="concurrency", target=concurrency)
+    cases = itertools.cycle(test_cases)
+    start = time.perf_counter()
+
+    async def worker():
+        while time.perf_counter() - start < duration:
+            await _conversation(runner, next(cases), step)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    step.duration = time.perf_counter() - start
+    return step
+
+
+def _fmt(values: list[float]) -> str:
+    p = _percentiles(values)
+    if p["p50"] is None:
+        return "n/a"
+    return f"{p['p50']:.2f}/{p['p90']:.2f}/{p['p99']:.2f}s"
+
+
+def print_step(step: LoadStep):
+    print(f"{step.label():<16} {step.conversations_per_sec:>7.2f} {step.requests_per_sec:>7.2f}  "
+          f"{_fmt(step.round_latencies):<22} {_fmt(step.conversation_latencies):<22} "
+          f"{step.error_rate * 100:>5.1f}% ({step.errors}/{step.conversations})")
+
+
+def save_loadtest(model_name: str, steps: list[LoadStep], output_file: str):
+    with open(output_file, "w") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "model": model_name,
+            "steps": [
+                {
+                    **{k: v for k, v in asdict(step).items() if not k.endswith("latencies")},
+                    "requests_per_sec": step.requests_per_sec,
+                    "conversations_per_sec": step.conversations_per_sec,
+                    "error_rate": step.error_rate,
+                    "round_latency": _percentiles(step.round_latencies),
+                    "conversation_latency": _percentiles(step.conversation_latencies),
+                }
+                for step in steps
+            ],
+        }, f, indent=2)
+
+
+def _levels(text: str, kind=float) -> list:
+    return [kind(v) for v in text.split(",") if v.strip()]
+
+
+async def run_loadtest(runner: TestRunner, test_cases: list[TestCase], args: argparse.Namespace) -> list[LoadStep]:
+    if not await wait_for_backend(runner, args.wait_timeout):
+        return []
+
+    if args.rate:
+        levels = [("rate", level) for level in _levels(args.rate)]
+    else:
+        levels = [("concurrency", level) for level in _levels(args.concurrency, int)]
+
+    print(f"🏋️  Load test: {runner.model} ({runner.backend_type}), {args.duration:g}s per step, "
+          f"{len(test_cases)} test cases")
+    print(f"{'Load':<16} {'Conv/s':>7} {'Req/s':>7}  {'Round p50/p90/p99':<22} {'Conv p50/p90/p99':<22} Errors")
+
+    steps = []
+    with _console_buffering():
+        for mode, level in levels:
+            if mode == "rate":
+                step = await run_open_loop(runner, test_cases, level, args.duration)
+            else:
+                step = await run_closed_loop(runner, test_cases, level, args.duration)
+            print_step(step)
+            steps.append(step)
+            if runner.limiter.circuit_open:
+                print(f"❌ Circuit breaker open for {runner.limiter.name}; stopping")
+                break
+
+    errors = {}
+    for step in steps:
+        for message, count in step.error_messages.items():
+            errors[message] = errors.get(message, 0) + count
+    for message, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"   {count}× {message}")
+    return steps
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="run.py loadtest",
+        description="Measure throughput and latency percentiles under sustained load",
+    )
+    parser.add_argument("--model", default=os.getenv("OPENAI_MODEL", ""))
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY", "DMR"))
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL", "http://localhost:11434/v1"))
+    parser.add_argument("--host", default="localhost", help="Hostname for Ollama/llama.cpp backends (default: localhost)")
+    parser.add_argument("--config", default="config/test_cases.json")
+    parser.add_argument("--test-case", default=None)
+    parser.add_argument("--wait-timeout", type=int, default=30, help="Seconds to wait for a local server")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", default=None,
+                      help="Open-loop arrival rates: comma-separated new conversations per second, e.g. 0.5,1,2")
+    load.add_argument("--concurrency", default="1,2,4,8",
+                      help="Closed-loop levels: comma-separated conversations in flight (default: 1,2,4,8)")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds per load step (default: 60)")
+    parser.add_argument("--stream", action="store_true", help="Use streaming completions")
+    parser.add_argument("--prompt-cache", action="store_true", help="Cache the static system prompt and tool schema")
+    parser.add_argument("--max-retries", type=int, default=0,
+                        help="Retries for throttled/transient errors (default: 0, so errors are measured)")
+    parser.add_argument("--fake-profile", default=None, help="JSON latency/fault profile for the fake/ backends")
+    parser.add_argument("--catalog", default=None,
+                        help="Product catalog for search_products (JSON, JSONL or a .sqlite store; default: the built-in fixture)")
+    parser.add_argument("--search-limit", type=int, default=20,
+                        help="Most products a search_products call returns with --catalog (default: 20)")
+    args = parser.parse_args(argv)
+
+    fake_profile = FakeProfile.from_file(args.fake_profile) if args.fake_profile else FakeProfile()
+    fake_profile.test_cases = args.config
+    # Don't shape the offered load: no rate limits, and the breaker only
+    # trips when nothing at all gets through
+    rate_limit = RateLimitConfig(max_concurrency=100_000, max_retries=args.max_retries, failure_threshold=1_000)
+    runner = TestRunner(args.api_key, args.base_url, args.model, host=args.host, rate_limit=rate_limit,
+                        stream=args.stream, fake_profile=fake_profile, prompt_cache=args.prompt_cache)
+    if runner.backend_type is None:
+        print_usage()
+        return
+    if args.catalog:
+        runner.catalog = load_catalog(args.catalog, limit=args.search_limit)
+
+    test_cases = load_test_cases(args.config, args.test_case)
+    if not test_cases:
+        print("No test cases found")
+        return
+
+    try:
+        steps = asyncio.run(run_loadtest(runner, test_cases, args))
+    finally:
+        runner.close()
+    if steps:
+        sanitized = runner.model.replace("/", "_").replace(":", "_").replace(" ", "_")
+        Path("results").mkdir(exist_ok=True)
+        output_file = f"results/loadtest_{sanitized}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        save_loadtest(runner.model, steps, output_file)
+        print(f"\n💾 Load test results saved to: {output_file}")
@@ -1,13 +1,29 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import io
 import json
 import os
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 
-from .models import TestCase, ExpectedToolPath, ExpectedToolCall, InitialCartState, InitialCartItem, AgentTestResult, AgentReport
-from .runner import TestRunner
+from .analysis import analyze_model
+from .cassette import Cassette
+from .catalog import load_catalog
+from .fakeserver import FakeProfile
+from .judgecache import JudgeCache
+from .matching import FuzzyMatchConfig
+from .paths import compile_path, flat_variants, step_constraints
+from .models import TestCase, ExpectedToolPath, ExpectedToolCall, InitialCartState, InitialCartItem, AgentBudget, AgentTestResult, AgentReport, AgentResponse, BatchRound, JudgeVerdict, TokenUsage
+from .pricing import ModelPrice, find_price, load_pricing, usage_cost
+from .ratelimit import RateLimitConfig
+from .runner import AgentConversation, TestRunner, evaluate_with_llm_judge_batch
 
 
 def load_test_cases(config_file: str, test_case_name: str | None = None) -> list[TestCase]:
@@ -25,17 +41,22 @@ def load_test_cases(config_file: str, test_case_name: str | None = None) -> list
         variants = []
         for variant in tc.get("expected_tools_variants", []):
             tools = [ExpectedToolCall(**tool) for tool in variant["tools"]]
-            variants.append(ExpectedToolPath(
+            path = ExpectedToolPath(
                 name=variant["name"],
                 tools=tools,
                 description=variant.get("description", "")
-            ))
+            )
+            # Compile once here; matching reuses it for every run
+            compile_path(path)
+            variants.append(path)
         
         test_case = TestCase(
             name=tc["name"],
             prompt=tc["prompt"],
             expected_tools_variants=variants,
-            initial_cart_state=initial_cart
+            initial_cart_state=initial_cart,
+            max_rounds=tc.get("max_rounds"),
+            time_budget=tc.get("time_budget")
         )
         
         if test_case_name is None or test_case.name == test_case_name:
@@ -44,32 +65,191 @@ def load_test_cases(config_file: str, test_case_name: str | None = None) -> list
     return test_cases
 
 
-def run_single_test(runner: TestRunner, test_case: TestCase) -> AgentTestResult:
+# Per-test output buffer. When set, everything the runner prints for a test is
+# collected here and flushed as one block, so concurrent tests don't interleave.
+_test_output: ContextVar[io.StringIO | None] = ContextVar("_test_output", default=None)
+
+
+class _BufferedStdout:
+    """stdout proxy that writes to the active per-test buffer, if any."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        buffer = _test_output.get()
+        if buffer is not None:
+            return buffer.write(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        if _test_output.get() is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+@contextmanager
+def _console_buffering():
+    """Install the buffered stdout proxy for the duration of the block.
+
+    Re-entrant: nested uses (e.g. one run per model in a sweep) share the
+    outermost proxy.
+    """
+    if isinstance(sys.stdout, _BufferedStdout):
+        yield
+        return
+    original_stdout = sys.stdout
+    sys.stdout = _BufferedStdout(original_stdout)
+    try:
+        yield
+    finally:
+        sys.stdout = original_stdout
+
+
+@contextmanager
+def _captured_output():
+    """Collect everything printed in the current task into a buffer."""
+    buffer = io.StringIO()
+    token = _test_output.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _test_output.reset(token)
+
+
+def _write_block(text: str):
+    """Write a captured block to the console in one piece."""
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+@contextmanager
+def _output_block(enabled: bool = True):
+    """Print everything inside the block as one piece, if enabled."""
+    if not enabled:
+        yield
+        return
+    with _captured_output() as buffer:
+        yield
+    _write_block(buffer.getvalue())
+
+
+async def run_single_test_buffered(runner: TestRunner, test_case: TestCase) -> tuple[AgentTestResult, str]:
+    """Run a single test case, capturing its console output."""
+    with _captured_output() as buffer:
+        result = await run_single_test(runner, test_case)
+    return result, buffer.getvalue()
+
+
+async def run_test_cases_async(
+    runner: TestRunner,
+    test_cases: list[TestCase],
+    concurrency: int = 1,
+    buffered: bool | None = None,
+    label: str = "",
+    semaphore: asyncio.Semaphore | None = None,
+) -> list[AgentTestResult]:
+    """Run test cases on one event loop with at most `concurrency` in flight.
+
+    Results are returned in the same order as test_cases regardless of the
+    order in which they complete. When buffered (the default for
+    concurrency > 1), each test's output is printed as one block, prefixed
+    with `label` if given. Pass a shared `semaphore` to bound several
+    concurrent calls (e.g. repeated runs) as one pool.
+    """
+    if buffered is None:
+        buffered = concurrency > 1
+    if not buffered:
+        return [await run_single_test(runner, test_case) for test_case in test_cases]
+
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+    prefix = f"\n[{label}]" if label else ""
+
+    async def run_one(test_case: TestCase) -> AgentTestResult:
+        async with semaphore:
+            result, output = await run_single_test_buffered(runner, test_case)
+        _write_block(prefix + output)
+        return result
+
+    with _console_buffering():
+        return list(await asyncio.gather(*(run_one(tc) for tc in test_cases)))
+
+
+def run_test_cases(runner: TestRunner, test_cases: list[TestCase], concurrency: int = 1) -> list[AgentTestResult]:
+    """Run test cases, optionally with several in flight at once."""
+    return asyncio.run(run_test_cases_async(runner, test_cases, concurrency))
+
+
+async def run_single_test(runner: TestRunner, test_case: TestCase) -> AgentTestResult:
     """Run a single test case."""
-    start = time.time()
-    response, _, error = runner.run_agent_test(test_case)
-    elapsed = time.time() - start
+    start = time.perf_counter()
+    response, _, error = await runner.run_agent_test_async(test_case)
+    return await score_test(runner, test_case, response, error, time.perf_counter() - start)
+
 
+async def score_test(
+    runner: TestRunner,
+    test_case: TestCase,
+    response: AgentResponse | None,
+    error: str,
+    elapsed: float,
+) -> AgentTestResult:
+    """Match a finished test's tool calls and print its result."""
     print(f"\n{'─'*60}")
     print(f"TEST RESULT: {test_case.name}")
     print(f"{'─'*60}")
 
+    stop_reason = response.stop_reason if response else "error"
     if error:
         print(f"❌ FAILED - Error: {error}")
+        if response and response.tool_calls:
+            print(f"   Tool calls made: {len(response.tool_calls)}")
         print(f"   Total time: {elapsed:.2f}s\n")
+        # The response keeps the usage of the rounds run before the test
+        # stopped, so it still counts towards the run's tokens and cost
         return AgentTestResult(
             test_case=test_case,
             success=False,
             response_time=elapsed,
-            error_message=error
+            response=response,
+            error_message=error,
+            stop_reason=stop_reason
+        )
+
+    judge_start = time.perf_counter()
+    verdicts = []
+    matched_path, tier = runner.prematch_tool_path(response.tool_calls, test_case.expected_tools_variants)
+    deferred = tier == "judge" and runner.defer_judge
+    if tier == "judge" and not deferred:
+        # The LLM judge is a blocking call; keep it off the event loop
+        matched_path = await asyncio.to_thread(
+            runner.judge_tool_path, response.tool_calls, test_case.expected_tools_variants, test_case.prompt, verdicts
+        )
+    judge_time = time.perf_counter() - judge_start
+
+    if deferred:
+        print("⏳ PENDING - Brittle and fuzzy match failed; queued for the LLM judge at the end of the run")
+        print(f"   Tool calls made: {len(response.tool_calls)}")
+        print(f"   Total time: {elapsed:.2f}s\n")
+        return AgentTestResult(
+            test_case=test_case,
+            success=False,
+            response_time=elapsed,
+            response=response,
+            judge_time=judge_time,
+            match_tier=tier,
+            stop_reason=stop_reason
         )
 
-    matched_path = runner.match_tool_path(response.tool_calls, test_case.expected_tools_variants, test_case.prompt)
     success = bool(matched_path) or len(test_case.expected_tools_variants) == 0
 
     if success:
         if matched_path:
-            print(f"✅ PASSED - Matched variant: {matched_path}")
+            fuzzy = " (fuzzy match)" if tier == "fuzzy" else ""
+            print(f"✅ PASSED - Matched variant: {matched_path}{fuzzy}")
         else:
             print(f"✅ PASSED - No tool calls expected (and none made)")
         print(f"   Tool calls made: {len(response.tool_calls)}")
@@ -81,7 +261,9 @@ def run_single_test(runner: TestRunner, test_case: TestCase) -> AgentTestResult:
             print(f"     Variant {i}: {variant.name}")
             for j, tool in enumerate(variant.tools, 1):
                 args_str = json.dumps(tool.arguments) if tool.arguments else "{}"
-                print(f"       {j}. {tool.name}({args_str})")
+                constraints = step_constraints(tool)
+                constraints_str = f"  {json.dumps(constraints)}" if constraints else ""
+                print(f"       {j}. {tool.name}({args_str}){constraints_str}")
 
         print(f"\n   Actual tool calls made:")
         if response.tool_calls:
@@ -97,10 +279,186 @@ def run_single_test(runner: TestRunner, test_case: TestCase) -> AgentTestResult:
         success=success,
         response_time=elapsed,
         response=response,
-        matched_path=matched_path
+        matched_path=matched_path,
+        judge_time=judge_time,
+        judge=verdicts[0] if verdicts else None,
+        match_tier=tier,
+        stop_reason=stop_reason
     )
 
 
+async def run_test_cases_lockstep(
+    runner: TestRunner,
+    test_cases: list[TestCase],
+    runs: int = 1,
+    labels: list[str] | None = None,
+    batch_label: str = "",
+) -> tuple[list[list[AgentTestResult]], list[BatchRound]]:
+    """Run every test case `runs` times as one batch, a round at a time.
+
+    Each round, every conversation still going sends its next request at
+    once and runs the tool calls it gets back against its own cart; the
+    next round starts when all of them are done. This keeps a
+    continuous-batching server (llama.cpp parallel slots, vLLM, Ollama
+    with OLLAMA_NUM_PARALLEL) full. Conversations leave the batch as they
+    finish, and each test's output is printed as one block at that point,
+    prefixed with its run's label. Per-round throughput lines are prefixed
+    with `batch_label`.
+
+    Returns the results per run (in test-case order) and the batch's rounds.
+    """
+    labels = labels or [""] * runs
+    batch = []
+    for k in range(runs):
+        for i, test_case in enumerate(test_cases):
+            buffer = io.StringIO()
+            token = _test_output.set(buffer)
+            try:
+                conversation = AgentConversation(runner, test_case)
+            finally:
+                _test_output.reset(token)
+            batch.append((k, i, conversation, buffer))
+
+    async def advance(conversation: AgentConversation, buffer: io.StringIO):
+        token = _test_output.set(buffer)
+        try:
+            await conversation.step()
+        finally:
+            _test_output.reset(token)
+
+    async def score(conversation: AgentConversation, buffer: io.StringIO, elapsed: float) -> AgentTestResult:
+        response, _, error = conversation.result()
+        token = _test_output.set(buffer)
+        try:
+            return await score_test(runner, conversation.test_case, response, error, elapsed)
+        finally:
+            _test_output.reset(token)
+
+    results: list[list[AgentTestResult | None]] = [[None] * len(test_cases) for _ in range(runs)]
+    rounds: list[BatchRound] = []
+    start = time.perf_counter()
+    active = batch
+    while active:
+        made = {id(c): len(c.rounds) for _, _, c, _ in active}
+        round_start = time.perf_counter()
+        await asyncio.gather(*(advance(c, buffer) for _, _, c, buffer in active))
+        batch_round = BatchRound(
+            round=len(rounds) + 1,
+            requests=len(active),
+            wall_time=time.perf_counter() - round_start,
+            completion_tokens=sum(
+                c.rounds[-1].usage.completion_tokens
+                for _, _, c, _ in active if len(c.rounds) > made[id(c)] and c.rounds[-1].usage
+            ),
+        )
+        rounds.append(batch_round)
+        rate = f", {batch_round.tokens_per_sec:.1f} tok/s" if batch_round.tokens_per_sec else ""
+        prefix = f"[{batch_label}] " if batch_label else ""
+        _write_block(f"\n{prefix}🚂 Batch round {batch_round.round}: {batch_round.requests} requests in "
+                     f"{batch_round.wall_time:.2f}s, {batch_round.completion_tokens} completion tokens{rate}\n")
+
+        # Score the tests that just finished together, so inline judge
+        # calls overlap instead of holding up the next round one by one
+        finished = [entry for entry in active if entry[2].done]
+        elapsed = time.perf_counter() - start
+        scores = await asyncio.gather(*(score(c, buffer, elapsed) for _, _, c, buffer in finished))
+        for (k, i, _, buffer), result in zip(finished, scores):
+            results[k][i] = result
+            prefix = f"\n[{labels[k]}]" if labels[k] else ""
+            _write_block(prefix + buffer.getvalue())
+        active = [entry for entry in active if not entry[2].done]
+    return results, rounds
+
+
+async def _run_judge_groups(
+    groups: list[list[AgentTestResult]],
+    cache: JudgeCache | None,
+    judge: TestRunner | None,
+    concurrency: int,
+) -> list[tuple[list[JudgeVerdict], float]]:
+    """Judge each group of results in one call, at most `concurrency` at a time.
+
+    Returns (verdicts, seconds) per group, in order.
+    """
+    loop = asyncio.get_running_loop()
+    # The judge is a blocking call; give it its own threads so
+    # --judge-concurrency isn't capped by the default executor's size
+    executor = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="judge")
+
+    async def run(group: list[AgentTestResult]) -> tuple[list[JudgeVerdict], float]:
+        cases = [(r.test_case.prompt, r.response.tool_calls, r.test_case.expected_tools_variants) for r in group]
+        start = time.perf_counter()
+        # Run in a copy of this context so judge warnings land in the right output buffer
+        verdicts = await loop.run_in_executor(
+            executor, copy_context().run, evaluate_with_llm_judge_batch, cases, cache, judge
+        )
+        return verdicts, time.perf_counter() - start
+
+    try:
+        return list(await asyncio.gather(*(run(group) for group in groups)))
+    finally:
+        executor.shutdown(wait=False)
+
+
+async def resolve_deferred_judging(
+    runner: TestRunner,
+    results: list[AgentTestResult],
+    concurrency: int = 8,
+    pack: int = 1,
+):
+    """Judge the tests left undecided by runner.defer_judge, updating results in place.
+
+    Cases are sent `pack` per judge prompt, with at most `concurrency` judge
+    calls in flight on the shared judge client.
+    """
+    pending = [
+        r for r in results
+        if r.response is not None and r.judge is None and r.match_tier == "judge"
+    ]
+    if not pending:
+        return
+
+    pack = max(pack, 1)
+    groups = [pending[i:i + pack] for i in range(0, len(pending), pack)]
+    start = time.perf_counter()
+    for group, (verdicts, elapsed) in zip(
+        groups, await _run_judge_groups(groups, runner.judge_cache, runner.judge, concurrency)
+    ):
+        for r, verdict in zip(group, verdicts):
+            r.judge = verdict
+            # A packed call's latency is shared by the tests in it
+            r.judge_time += elapsed / len(group)
+            r.matched_path = runner.verdict_path(verdict, r.test_case.expected_tools_variants)
+            r.success = bool(r.matched_path) or len(r.test_case.expected_tools_variants) == 0
+    wall_time = time.perf_counter() - start
+
+    print(f"\n🤖 LLM judge: {len(pending)} deferred tests in {len(groups)} judge calls, {wall_time:.2f}s")
+    for r in pending:
+        status = f"✅ PASSED ({r.matched_path})" if r.success else "❌ FAILED"
+        cached = " [cached]" if r.judge.cache == "hit" else ""
+        print(f"   {r.test_case.name}: {status}{cached}")
+        if r.judge.reasoning:
+            print(f"      📝 {r.judge.reasoning}")
+
+
+async def compare_with_default_judge(runner: TestRunner, results: list[AgentTestResult], concurrency: int = 8):
+    """Ask the default judge about every case --judge-model judged, for the agreement rate."""
+    judged = [r for r in results if r.judge is not None and not r.judge.error]
+    if runner.judge is None or not judged:
+        return
+    groups = [[r] for r in judged]
+    for r, (verdicts, _) in zip(judged, await _run_judge_groups(groups, runner.judge_cache, None, concurrency)):
+        r.reference_judge = verdicts[0]
+
+    compared = [r for r in judged if not r.reference_judge.error]
+    agreed = sum(1 for r in compared if r.judge.success == r.reference_judge.success)
+    print(f"\n⚖️  Default judge agreed with {runner.judge.model_spec} on {agreed}/{len(compared)} verdicts")
+    for r in compared:
+        if r.judge.success != r.reference_judge.success:
+            print(f"   {r.test_case.name}: {'pass' if r.judge.success else 'fail'} vs "
+                  f"{'pass' if r.reference_judge.success else 'fail'} (default) - {r.reference_judge.reasoning}")
+
+
 def print_summary(report: AgentReport):
     """Print test summary."""
     print("\n" + "=" * 60)
@@ -112,6 +470,38 @@ def print_summary(report: AgentReport):
     print(f"📊 Success Rate:    {report.passed_tests/report.total_tests*100:.2f}%")
     print(f"⏱️  Total LLM Time:  {report.total_llm_time:.2f}s")
     print(f"⏱️  Avg per Request: {report.avg_time_per_req:.2f}s")
+    print(f"⏱️  Wall Clock Time: {report.wall_time:.2f}s (concurrency {report.concurrency})")
+    cache_write = f", {report.usage.cache_write_tokens} cache write" if report.usage.cache_write_tokens else ""
+    print(f"🔢 Tokens:          {report.usage.prompt_tokens} prompt ({report.usage.cached_tokens} cached{cache_write}), "
+          f"{report.usage.completion_tokens} completion")
+    if report.total_cost is not None:
+        per_pass = f"${report.total_cost / report.passed_tests:.4f}" if report.passed_tests else "n/a"
+        print(f"💰 Cost:            ${report.total_cost:.4f} total, "
+              f"${report.total_cost / report.total_tests:.4f}/test, {per_pass}/passing test")
+    if report.batch_rounds:
+        rate = f", {report.batch_tokens_per_sec:.1f} tok/s aggregate" if report.batch_tokens_per_sec else ""
+        print(f"🚂 Batched:         {len(report.batch_rounds)} rounds, "
+              f"up to {max(r.requests for r in report.batch_rounds)} requests per round{rate}")
+    if report.match_tiers:
+        tiers = ", ".join(f"{tier} {report.match_tiers[tier]}"
+                          for tier in ("brittle", "fuzzy", "judge") if tier in report.match_tiers)
+        print(f"🎯 Decided By:      {tiers}")
+    if report.stop_reasons:
+        reasons = ", ".join(f"{reason} {count}" for reason, count in sorted(report.stop_reasons.items()))
+        print(f"🛑 Stopped Early:   {reasons}")
+    if report.judge_cache_hits or report.judge_cache_misses:
+        print(f"🗄️  Judge Cache:     {report.judge_cache_hits} hits, {report.judge_cache_misses} misses")
+    if report.judge_latency is not None:
+        print(f"⚖️  Judge:           {report.judge_model}, {report.judge_latency:.2f}s avg per judged test")
+    if report.judge_compared:
+        print(f"⚖️  Judge Agreement: {report.judge_agreed}/{report.judge_compared} "
+              f"({report.judge_agreed / report.judge_compared * 100:.1f}%) with the default judge")
+    if report.phases:
+        # Everything except waiting on the backend is harness overhead
+        overhead = sum(t for name, t in report.phases.items() if name != "network")
+        breakdown = ", ".join(f"{name} {t:.2f}s" for name, t in sorted(report.phases.items()))
+        print(f"🧮 Phases:          {breakdown}")
+        print(f"🧮 Harness Overhead: {overhead:.2f}s vs {report.phases.get('network', 0.0):.2f}s network")
     print("=" * 60)
 
 
@@ -141,101 +531,123 @@ def wait_for_server(base_url: str, server_name: str, timeout: int = 30):
     return False
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Model testing tool for function calling")
-    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY", "DMR"))
-    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL", "http://localhost:11434/v1"))
-    parser.add_argument("--model", default=os.getenv("OPENAI_MODEL", ""))
-    parser.add_argument("--config", default="config/test_cases.json")
-    parser.add_argument("--test-case", default=None)
-    parser.add_argument("--wait-timeout", type=int, default=30, help="Seconds to wait for Ollama")
-    parser.add_argument("--host", default="localhost", help="Hostname for Ollama/llama.cpp backends (default: localhost)")
+# Backends that share local GPU(s); a sweep runs these one model at a time.
+LOCAL_BACKENDS = ("ollama", "llama.cpp")
 
-    args = parser.parse_args()
 
-    # Create runner to determine backend type
-    runner = TestRunner(args.api_key, args.base_url, args.model, host=args.host)
+def print_usage():
+    """Print usage help for an invalid or missing --model."""
+    print("❌ Error: No valid model prefix specified\n")
+    print("Usage: python3 run.py --model <prefix>/<model-name> [--host <hostname>]")
+    print("       python3 run.py --models <model>,<model>,... | --sweep-file <file>\n")
+    print("Supported prefixes:")
+    print("  ollama/<model>         - Connect to Ollama (default: localhost:11434)")
+    print("  llama.cpp/<model>      - Connect to llama.cpp server (default: localhost:8080)")
+    print("  bedrock/<model-id>     - Connect to AWS Bedrock")
+    print("  vertex/<model-id>      - Connect to Google Vertex AI (Gemini models)")
+    print("  vertex-maas/<model-id> - Connect to Vertex AI Model Garden MaaS")
+    print("  replay/<cassette>      - Replay a cassette recorded with --record (no network)")
+    print("  fake/<name>            - Bundled fake OpenAI-compatible server (scripted, no GPU/network)")
+    print("  fake-bedrock/<name>    - Fake model behind the Bedrock client")
+    print("  fake-vertex/<name>     - Fake model behind the Vertex AI client\n")
+    print("Options:")
+    print("  --host <hostname>   - Set hostname for Ollama/llama.cpp (default: localhost)\n")
+    print("Examples:")
+    print("  python3 run.py --model 'ollama/llama3.2'")
+    print("  python3 run.py --model 'ollama/qwen3:8b' --host myserver.local")
+    print("  python3 run.py --model 'llama.cpp/my-model' --host 192.168.1.100")
+    print("  python3 run.py --model 'bedrock/anthropic.claude-3-5-sonnet-20241022-v2:0'")
+    print("  python3 run.py --model 'vertex/gemini-2.0-flash'")
+    print("  python3 run.py --model 'vertex-maas/zai-org/glm-4.7-maas'")
+    print("  python3 run.py --models 'ollama/qwen3:8b,bedrock/us.amazon.nova-micro-v1:0'")
+    print("  python3 run.py loadtest --model 'llama.cpp/my-model' --concurrency 1,2,4,8 --duration 60")
+    print("  python3 run.py --model 'replay/cassettes/llama3.2_20250101_120000.jsonl.gz'")
 
-    # Check if a valid backend was specified
-    if runner.backend_type is None:
-        print("❌ Error: No valid model prefix specified\n")
-        print("Usage: python3 run.py --model <prefix>/<model-name> [--host <hostname>]\n")
-        print("Supported prefixes:")
-        print("  ollama/<model>         - Connect to Ollama (default: localhost:11434)")
-        print("  llama.cpp/<model>      - Connect to llama.cpp server (default: localhost:8080)")
-        print("  bedrock/<model-id>     - Connect to AWS Bedrock")
-        print("  vertex/<model-id>      - Connect to Google Vertex AI (Gemini models)")
-        print("  vertex-maas/<model-id> - Connect to Vertex AI Model Garden MaaS\n")
-        print("Options:")
-        print("  --host <hostname>   - Set hostname for Ollama/llama.cpp (default: localhost)\n")
-        print("Examples:")
-        print("  python3 run.py --model 'ollama/llama3.2'")
-        print("  python3 run.py --model 'ollama/qwen3:8b' --host myserver.local")
-        print("  python3 run.py --model 'llama.cpp/my-model' --host 192.168.1.100")
-        print("  python3 run.py --model 'bedrock/anthropic.claude-3-5-sonnet-20241022-v2:0'")
-        print("  python3 run.py --model 'vertex/gemini-2.0-flash'")
-        print("  python3 run.py --model 'vertex-maas/zai-org/glm-4.7-maas'")
-        return
 
-    model_name = runner.model
+def load_sweep_file(path: str) -> list[str]:
+    """Load model names from a sweep file (one per line, # starts a comment)."""
+    models = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                models.append(line)
+    return models
 
-    # Wait for local servers
-    if runner.backend_type == "llama.cpp":
-        if not wait_for_server(runner.actual_base_url, "llama.cpp server", args.wait_timeout):
-            print("\n💡 Tip: Start llama.cpp server with './server -m <model>' in another terminal")
-            return
-    elif runner.backend_type == "ollama":
-        if not wait_for_server(runner.actual_base_url, "Ollama", args.wait_timeout):
-            print("\n💡 Tip: Start Ollama with 'ollama serve' in another terminal")
-            return
-    
-    # Load test cases
-    test_cases = load_test_cases(args.config, args.test_case)
-    
-    if not test_cases:
-        print(f"No test cases found")
-        return
-    
-    # Setup output
-    sanitized = model_name.replace("/", "_").replace(":", "_").replace(" ", "_")
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    Path("results").mkdir(exist_ok=True)
-    output_file = f"results/agent_test_results_{sanitized}_{timestamp}.json"
-    
-    print(f"🚀 Starting Agent Loop Tool Efficiency Test")
-    print(f"📊 Configuration:")
-    print(f"   Backend: {runner.backend_type}")
-    print(f"   Base URL: {runner.actual_base_url}")
-    print(f"   Model: {model_name}")
-    print(f"   Test Cases: {len(test_cases)}")
-    print(f"   Output: {output_file}\n")
-
-    # Run tests (runner already created earlier)
-    results = []
-
-    for test_case in test_cases:
-        result = run_single_test(runner, test_case)
-        results.append(result)
-    
-    # Generate report
+
+def build_report(
+    results: list[AgentTestResult],
+    wall_time: float,
+    concurrency: int,
+    price: ModelPrice | None = None,
+    batch_rounds: list[BatchRound] | None = None,
+) -> AgentReport:
+    """Aggregate per-test results into a report.
+
+    If a price is given, each result's cost and the run total are filled in.
+    `batch_rounds` are the rounds of the batched mode's batch, if used.
+    """
+    batch_rounds = batch_rounds or []
+    batch_time = sum(r.wall_time for r in batch_rounds)
     passed = sum(1 for r in results if r.success)
     failed = len(results) - passed
     total_llm_time = sum(r.response.llm_total_time for r in results if r.response)
     total_requests = sum(r.response.llm_requests for r in results if r.response)
     avg_time = total_llm_time / total_requests if total_requests > 0 else 0
-    
-    report = AgentReport(
+
+    usage = TokenUsage()
+    phases: dict[str, float] = {}
+    for r in results:
+        if r.response:
+            usage += r.response.usage
+            if price:
+                r.cost = usage_cost(r.response.usage, price)
+            for m in r.response.rounds:
+                for name, seconds in m.phases.items():
+                    phases[name] = phases.get(name, 0.0) + seconds
+        if r.judge_time:
+            phases["judge"] = phases.get("judge", 0.0) + r.judge_time
+    judge_cache_hits = sum(1 for r in results if r.judge and r.judge.cache == "hit")
+    judge_cache_misses = sum(1 for r in results if r.judge and r.judge.cache == "miss")
+    judge_calls = [r.judge for r in results if r.judge and r.judge.cache != "hit" and not r.judge.error]
+    compared = [r for r in results if r.judge and r.reference_judge and not r.reference_judge.error]
+    match_tiers: dict[str, int] = {}
+    for r in results:
+        if r.match_tier:
+            match_tiers[r.match_tier] = match_tiers.get(r.match_tier, 0) + 1
+    stop_reasons: dict[str, int] = {}
+    for r in results:
+        if r.stop_reason and r.stop_reason != "completed":
+            stop_reasons[r.stop_reason] = stop_reasons.get(r.stop_reason, 0) + 1
+
+    return AgentReport(
         timestamp=datetime.now(),
         results=results,
         total_tests=len(results),
         passed_tests=passed,
         failed_tests=failed,
         total_llm_time=total_llm_time,
-        avg_time_per_req=avg_time
+        avg_time_per_req=avg_time,
+        wall_time=wall_time,
+        concurrency=concurrency,
+        usage=usage,
+        total_cost=usage_cost(usage, price) if price else None,
+        phases=phases,
+        judge_cache_hits=judge_cache_hits,
+        judge_cache_misses=judge_cache_misses,
+        judge_model=next((r.judge.judge_model for r in results if r.judge), ""),
+        judge_latency=sum(v.latency for v in judge_calls) / len(judge_calls) if judge_calls else None,
+        judge_compared=len(compared),
+        judge_agreed=sum(1 for r in compared if r.judge.success == r.reference_judge.success),
+        match_tiers=match_tiers,
+        stop_reasons=stop_reasons,
+        batch_rounds=batch_rounds,
+        batch_tokens_per_sec=sum(r.completion_tokens for r in batch_rounds) / batch_time if batch_time > 0 else None
     )
-    
-    # Save results
+
+
+def save_results(report: AgentReport, output_file: str):
+    """Write a report in the agent_test_results JSON layout."""
     with open(output_file, "w") as f:
         json.dump({
             "timestamp": report.timestamp.isoformat(),
@@ -244,43 +656,469 @@ def main():
             "failed_tests": report.failed_tests,
             "total_llm_time": report.total_llm_time,
             "avg_time_per_req": report.avg_time_per_req,
+            "wall_time": report.wall_time,
+            "concurrency": report.concurrency,
+            "usage": asdict(report.usage),
+            "total_cost": report.total_cost,
+            "phases": report.phases,
+            "judge_cache": {"hits": report.judge_cache_hits, "misses": report.judge_cache_misses},
+            "judge_model": report.judge_model,
+            "judge_latency": report.judge_latency,
+            "judge_agreement": {"compared": report.judge_compared, "agreed": report.judge_agreed},
+            "match_tiers": report.match_tiers,
+            "stop_reasons": report.stop_reasons,
+            "batch": {
+                "rounds": [asdict(r) for r in report.batch_rounds],
+                "tokens_per_sec": report.batch_tokens_per_sec,
+            } if report.batch_rounds else None,
             "results": [
                 {
                     "test_case": {
                         "name": r.test_case.name,
                         "prompt": r.test_case.prompt,
+                        # Partial-order variants are expanded into flat
+                        # sequences here, so analyses can treat every
+                        # variant as a plain list of calls
                         "expected_tools_variants": [
                             {
-                                "name": v.name,
+                                "name": name,
                                 "description": v.description,
                                 "tools": [
                                     {
                                         "name": t.name,
                                         "arguments": t.arguments
                                     }
+                                    for t in steps
+                                ]
+                            }
+                            for v in r.test_case.expected_tools_variants
+                            for name, steps in flat_variants(v)
+                        ],
+                        "expected_paths": [
+                            {
+                                "name": v.name,
+                                "description": v.description,
+                                "tools": [
+                                    {"name": t.name, "arguments": t.arguments, **step_constraints(t)}
                                     for t in v.tools
                                 ]
                             }
                             for v in r.test_case.expected_tools_variants
-                        ]
+                        ] if any(compile_path(v).flexible for v in r.test_case.expected_tools_variants) else None
                     },
                     "success": r.success,
                     "response_time": r.response_time,
                     "matched_path": r.matched_path,
+                    "match_tier": r.match_tier,
                     "error_message": r.error_message,
+                    "stop_reason": r.stop_reason,
+                    "cost": r.cost,
+                    "judge_time": r.judge_time,
+                    "judge": asdict(r.judge) if r.judge else None,
+                    "reference_judge": asdict(r.reference_judge) if r.reference_judge else None,
                     "response": {
                         "tool_calls": [{"name": tc.tool_name, "args": tc.arguments} for tc in r.response.tool_calls],
                         "llm_requests": r.response.llm_requests,
                         "llm_total_time": r.response.llm_total_time,
-                        "final_message": r.response.final_message
+                        "final_message": r.response.final_message,
+                        "stop_reason": r.response.stop_reason,
+                        "rounds": [asdict(m) for m in r.response.rounds],
+                        "usage": asdict(r.response.usage)
                     } if r.response else None
                 }
-                for r in results
+                for r in report.results
             ]
         }, f, indent=2)
+
+
+def output_path(model_name: str, run: int | None = None) -> str:
+    """Results file path for a model, in the layout analyse_batch.py expects."""
+    sanitized = model_name.replace("/", "_").replace(":", "_").replace(" ", "_")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    suffix = f"_run{run}" if run is not None else ""
+    Path("results").mkdir(exist_ok=True)
+    return f"results/agent_test_results_{sanitized}_{timestamp}{suffix}.json"
+
+
+def cassette_path(model_name: str) -> str:
+    """Cassette file path for recording a model's responses."""
+    sanitized = model_name.replace("/", "_").replace(":", "_").replace(" ", "_")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    Path("cassettes").mkdir(exist_ok=True)
+    return f"cassettes/{sanitized}_{timestamp}.jsonl.gz"
+
+
+def print_aggregate(model_name: str, result_files: list[str], total_runs: int):
+    """Print macro-averaged metrics over the runs saved so far.
+
+    Uses the same analysis as analyse_batch.py, so the numbers match what
+    it reports for the same files.
+    """
+    analysis = analyze_model(model_name, result_files, "")
+    print(f"📊 Aggregate over {len(result_files)}/{total_runs} runs (macro-averaged):")
+    print(f"   Tool Invocation F1: {analysis.tool_invocation.f1:.3f}")
+    print(f"   Tool Selection F1:  {analysis.tool_selection.f1:.3f}")
+    print(f"   Avg Latency per LLM Call: {analysis.average_latency_per_call:.2f}s")
+
+
+async def wait_for_backend(runner: TestRunner, timeout: int) -> bool:
+    """Wait for a local server backend; cloud backends are always ready."""
+    if runner.backend_type == "llama.cpp":
+        if not await asyncio.to_thread(wait_for_server, runner.actual_base_url, "llama.cpp server", timeout):
+            print("\n💡 Tip: Start llama.cpp server with './server -m <model>' in another terminal")
+            return False
+    elif runner.backend_type == "ollama":
+        if not await asyncio.to_thread(wait_for_server, runner.actual_base_url, "Ollama", timeout):
+            print("\n💡 Tip: Start Ollama with 'ollama serve' in another terminal")
+            return False
+    return True
+
+
+async def run_model(
+    runner: TestRunner,
+    test_cases: list[TestCase],
+    args: argparse.Namespace,
+    sweep: bool = False,
+    price: ModelPrice | None = None,
+) -> list[tuple[AgentReport, str]] | None:
+    """Run the suite `args.runs` times against one model.
+
+    Repeated runs share the runner (and its clients) and are interleaved on
+    one pool of `args.concurrency` slots, or with --batched run as one
+    lockstep batch. Each run is saved to its own results file as soon as it
+    finishes. In sweep mode all console output is emitted as whole blocks
+    so several models can run side by side.
+
+    Returns (report, output_file) per run, or None if the backend never came up.
+    """
+    with _output_block(sweep):
+        ready = await wait_for_backend(runner, args.wait_timeout)
+    if not ready:
+        return None
+
+    model_name = runner.model
+    runs = max(args.runs, 1)
+    output_files = [output_path(model_name, k + 1 if runs > 1 else None) for k in range(runs)]
+    buffered = sweep or runs > 1 or args.concurrency > 1 or args.batched
+    concurrency = len(test_cases) * runs if args.batched else args.concurrency
+
+    with _output_block(sweep):
+        print("🚀 Starting Agent Loop Tool Efficiency Test")
+        print("📊 Configuration:")
+        print(f"   Backend: {runner.backend_type}")
+        print(f"   Base URL: {runner.actual_base_url}")
+        print(f"   Model: {model_name}")
+        print(f"   Test Cases: {len(test_cases)}")
+        if args.batched:
+            print(f"   Batched: {concurrency} conversations in lockstep")
+        else:
+            print(f"   Concurrency: {args.concurrency}")
+        if runs > 1:
+            print(f"   Runs: {runs}")
+        for output_file in output_files:
+            print(f"   Output: {output_file}")
+        if runner.recorder is not None:
+            print(f"   Recording: {runner.recorder.path}")
+        if runner.cassette is not None:
+            print(f"   Replaying: {len(runner.cassette)} recorded responses")
+        print()
+
+    semaphore = asyncio.Semaphore(max(args.concurrency, 1))
+    saved_files: list[str] = []
+
+    def run_label(index: int) -> str:
+        label = model_name if sweep else ""
+        if runs > 1:
+            label = f"{label} run {index + 1}".strip()
+        return label
+
+    async def run_once(index: int) -> tuple[AgentReport, str]:
+        wall_start = time.perf_counter()
+        results = await run_test_cases_async(
+            runner, test_cases, args.concurrency,
+            buffered=buffered, label=run_label(index), semaphore=semaphore,
+        )
+        return await finish_run(index, results, wall_start)
+
+    async def finish_run(
+        index: int,
+        results: list[AgentTestResult],
+        wall_start: float,
+        batch_rounds: list[BatchRound] | None = None,
+    ) -> tuple[AgentReport, str]:
+        """Judge deferred tests, then save and print one run's report."""
+        label = run_label(index)
+        if runner.defer_judge:
+            with _output_block(buffered):
+                if label:
+                    print(f"\n[{label}]", end="")
+                await resolve_deferred_judging(runner, results, args.judge_concurrency, args.judge_pack)
+        if args.judge_compare:
+            with _output_block(buffered):
+                if label:
+                    print(f"\n[{label}]", end="")
+                await compare_with_default_judge(runner, results, args.judge_concurrency)
+        wall_time = time.perf_counter() - wall_start
+
+        report = build_report(results, wall_time, concurrency, price, batch_rounds)
+        output_file = output_files[index]
+        save_results(report, output_file)
+        saved_files.append(output_file)
+
+        with _output_block(buffered):
+            if label:
+                print(f"\n[{label}]", end="")
+            print_summary(report)
+            print(f"\n💾 Results saved to: {output_file}")
+            if runner.limiter.retries:
+                print(f"🔁 {runner.limiter.name}: {runner.limiter.retries} retries "
+                      f"({runner.limiter.throttles} throttled), concurrency limit now {int(runner.limiter.limit)}")
+            if runs > 1:
+                print_aggregate(model_name, list(saved_files), runs)
+        return report, output_file
+
+    with _console_buffering() if buffered else nullcontext():
+        if args.batched:
+            wall_start = time.perf_counter()
+            results, batch_rounds = await run_test_cases_lockstep(
+                runner, test_cases, runs, [run_label(k) for k in range(runs)], model_name if sweep else ""
+            )
+            return list(await asyncio.gather(
+                *(finish_run(k, results[k], wall_start, batch_rounds) for k in range(runs))
+            ))
+        return list(await asyncio.gather(*(run_once(k) for k in range(runs))))
+
+
+async def run_sweep(
+    runners: list[TestRunner],
+    test_cases: list[TestCase],
+    args: argparse.Namespace,
+    pricing: dict[str, ModelPrice],
+):
+    """Run several models in one process.
+
+    Local backends (Ollama, llama.cpp) are serialised so they don't compete
+    for the same GPU; cloud backends run in parallel with everything else.
+    """
+    local_lock = asyncio.Lock()
+
+    async def run_one(runner: TestRunner):
+        price = find_price(pricing, runner.model)
+        if runner.backend_type in LOCAL_BACKENDS:
+            async with local_lock:
+                return await run_model(runner, test_cases, args, sweep=True, price=price)
+        return await run_model(runner, test_cases, args, sweep=True, price=price)
+
+    wall_start = time.perf_counter()
+    with _console_buffering():
+        outcomes = await asyncio.gather(*(run_one(r) for r in runners))
+    wall_time = time.perf_counter() - wall_start
+
+    print("\n" + "=" * 60)
+    print("📈 SWEEP SUMMARY")
+    print("=" * 60)
+    for runner, outcome in zip(runners, outcomes):
+        if outcome is None:
+            print(f"{runner.model}: ⚠️  skipped (backend not ready)")
+            continue
+        for report, output_file in outcome:
+            cost = f", ${report.total_cost:.4f}" if report.total_cost is not None else ""
+            print(f"{runner.model}: {report.passed_tests}/{report.total_tests} passed, "
+                  f"LLM time {report.total_llm_time:.2f}s, wall {report.wall_time:.2f}s{cost} → {output_file}")
+    print(f"⏱️  Sweep Wall Clock Time: {wall_time:.2f}s")
+    print("=" * 60)
+
+
+def main():
+    # Subcommands; the bare command line stays the accuracy test
+    if len(sys.argv) > 1 and sys.argv[1] == "loadtest":
+        from .loadtest import main as loadtest_main
+        loadtest_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Model testing tool for function calling")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY", "DMR"))
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL", "http://localhost:11434/v1"))
+    parser.add_argument("--model", default=os.getenv("OPENAI_MODEL", ""))
+    parser.add_argument("--models", default=None, help="Comma-separated list of models to run in one sweep")
+    parser.add_argument("--sweep-file", default=None, help="File listing models to run in one sweep (one per line)")
+    parser.add_argument("--config", default="config/test_cases.json")
+    parser.add_argument("--test-case", default=None)
+    parser.add_argument("--wait-timeout", type=int, default=30, help="Seconds to wait for Ollama")
+    parser.add_argument("--host", default="localhost", help="Hostname for Ollama/llama.cpp backends (default: localhost)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of test cases to run in parallel (default: 1)")
+    parser.add_argument("--runs", type=int, default=1, help="Number of repeated runs per model, one results file each (default: 1)")
+    parser.add_argument("--batched", action="store_true",
+                        help="Advance all test cases (x runs) round by round as one batch, for continuous-batching servers "
+                             "(replaces --concurrency)")
+    parser.add_argument("--pricing", default="config/pricing.json",
+                        help="Pricing table (USD per million tokens) used to cost each run")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream completions and record time-to-first-token and decode rate per round")
+    parser.add_argument("--rps", type=float, default=None, help="Max LLM requests per second per model (default: unlimited)")
+    parser.add_argument("--tpm", type=float, default=None, help="Max estimated prompt tokens per minute per model (default: unlimited)")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries for throttled/transient backend errors (default: 5)")
+    parser.add_argument("--breaker-threshold", type=int, default=10,
+                        help="Consecutive failed requests before a model is abandoned (default: 10)")
+    parser.add_argument("--prompt-cache", action="store_true",
+                        help="Cache the static system prompt and tool schema (Bedrock cachePoint, Vertex AI "
+                             "context cache, llama.cpp cache_prompt)")
+    parser.add_argument("--fake-profile", default=None,
+                        help="JSON latency/fault profile for the fake/, fake-bedrock/ and fake-vertex/ backends")
+    parser.add_argument("--judge-cache", default="cache/judge_cache.sqlite",
+                        help="SQLite file caching LLM-judge verdicts across runs (default: cache/judge_cache.sqlite)")
+    parser.add_argument("--judge-cache-size", type=int, default=10_000,
+                        help="Max cached judge verdicts; least recently used are evicted (default: 10000)")
+    parser.add_argument("--no-judge-cache", action="store_true", help="Always call the LLM judge; don't read or write the cache")
+    parser.add_argument("--refresh-judge-cache", action="store_true",
+                        help="Call the LLM judge for every verdict and overwrite cached ones")
+    parser.add_argument("--no-fuzzy-match", action="store_true",
+                        help="Skip the fuzzy matching tier; send every brittle-match failure to the LLM judge")
+    parser.add_argument("--fuzzy-name-threshold", type=float, default=0.6,
+                        help="Token-set similarity at which product names count as the same (default: 0.6)")
+    parser.add_argument("--fuzzy-catalog-threshold", type=float, default=0.6,
+                        help="Similarity at which a name is resolved to a catalog product (default: 0.6)")
+    parser.add_argument("--fuzzy-max-extra-reads", type=int, default=2,
+                        help="Extra read-only calls (search_products, view_cart) the fuzzy tier tolerates (default: 2)")
+    parser.add_argument("--fuzzy-strict-order", action="store_true",
+                        help="Fuzzy tier: require the expected calls in order instead of allowing independent calls to be reordered")
+    parser.add_argument("--inline-judge", action="store_true",
+                        help="Call the LLM judge inside each test instead of batching judge calls at the end of the run")
+    parser.add_argument("--judge-concurrency", type=int, default=8,
+                        help="Max concurrent LLM-judge calls when judging at the end of the run (default: 8)")
+    parser.add_argument("--judge-pack", type=int, default=1,
+                        help="Number of tests to pack into one LLM-judge prompt (default: 1)")
+    parser.add_argument("--judge-model", default=None,
+                        help="Model for the LLM judge, with the same prefixes as --model "
+                             "(default: Claude Sonnet 4.5 on Bedrock)")
+    parser.add_argument("--judge-host", default=None,
+                        help="Hostname for an Ollama/llama.cpp judge (default: --host)")
+    parser.add_argument("--judge-compare", action="store_true",
+                        help="Also ask the default judge about every case --judge-model judged, and report agreement")
+    parser.add_argument("--catalog", default=None,
+                        help="Product catalog for search_products (JSON, JSONL or a .sqlite store; default: the built-in fixture)")
+    parser.add_argument("--search-limit", type=int, default=20,
+                        help="Most products a search_products call returns with --catalog (default: 20)")
+    parser.add_argument("--max-rounds", type=int, default=10,
+                        help="Most model requests per test; a test's \"max_rounds\" overrides it (default: 10)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds of LLM time per test before it is stopped; a test's \"time_budget\" "
+                             "overrides it (default: unlimited)")
+    parser.add_argument("--loop-patience", type=int, default=2,
+                        help="Consecutive rounds that only repeat earlier tool calls and results before a test "
+                             "is stopped (0 disables loop detection; default: 2)")
+    parser.add_argument("--record", action="store_true",
+                        help="Record every LLM response to a cassette under cassettes/ for replay/ runs")
+
+    args = parser.parse_args()
+
+    model_names = []
+    if args.models:
+        model_names.extend(m.strip() for m in args.models.split(",") if m.strip())
+    if args.sweep_file:
+        model_names.extend(load_sweep_file(args.sweep_file))
+    if not model_names:
+        model_names = [args.model]
+
+    # Each model gets its own limiter with these settings, so models in a
+    # sweep each run at full concurrency and throttle independently
+    rate_limit = RateLimitConfig(
+        requests_per_second=args.rps,
+        tokens_per_minute=args.tpm,
+        # In batched mode the batch size bounds concurrency
+        max_concurrency=100_000 if args.batched else max(args.concurrency * max(args.runs, 1), 1),
+        max_retries=args.max_retries,
+        failure_threshold=args.breaker_threshold,
+    )
+
+    fake_profile = FakeProfile.from_file(args.fake_profile) if args.fake_profile else FakeProfile()
+    fake_profile.test_cases = args.config
+
+    # Create runners to determine backend types
+    runners = [
+        TestRunner(args.api_key, args.base_url, name, host=args.host, rate_limit=rate_limit,
+                   stream=args.stream, fake_profile=fake_profile, prompt_cache=args.prompt_cache)
+        for name in model_names
+    ]
+
+    judge = None
+    if args.judge_model:
+        judge = TestRunner(args.api_key, args.base_url, args.judge_model, host=args.judge_host or args.host,
+                           fake_profile=fake_profile)
+        if judge.backend_type in (None, "replay"):
+            print(f"❌ Invalid judge model: {args.judge_model}\n")
+            print_usage()
+            return
+        if not asyncio.run(wait_for_backend(judge, args.wait_timeout)):
+            return
+
+    fuzzy = FuzzyMatchConfig(
+        enabled=not args.no_fuzzy_match,
+        name_threshold=args.fuzzy_name_threshold,
+        catalog_threshold=args.fuzzy_catalog_threshold,
+        max_extra_reads=args.fuzzy_max_extra_reads,
+        allow_reorder=not args.fuzzy_strict_order,
+    )
+    budget = AgentBudget(max_rounds=args.max_rounds, time_budget=args.time_budget, loop_patience=args.loop_patience)
+    for runner in runners:
+        runner.defer_judge = not args.inline_judge
+        runner.judge = judge
+        runner.fuzzy = fuzzy
+        runner.budget = budget
+
+    if args.catalog:
+        catalog = load_catalog(args.catalog, limit=args.search_limit)
+        print(f"🛒 Catalog: {len(catalog)} products from {args.catalog}")
+        for runner in runners:
+            runner.catalog = catalog
+
+    judge_cache = None
+    if not args.no_judge_cache:
+        judge_cache = JudgeCache(args.judge_cache, args.judge_cache_size, refresh=args.refresh_judge_cache)
+        for runner in runners:
+            runner.judge_cache = judge_cache
+
+    if args.record:
+        for runner in runners:
+            if runner.backend_type not in (None, "replay"):
+                runner.recorder = Cassette(cassette_path(runner.model), runner.model, runner.backend_type)
+
+    # Check if a valid backend was specified
+    invalid = [name for name, runner in zip(model_names, runners) if runner.backend_type is None]
+    if invalid:
+        if len(model_names) > 1:
+            print(f"❌ Invalid model(s) in sweep: {', '.join(invalid)}\n")
+        print_usage()
+        return
+
+    # Load test cases once; every model runs the same suite
+    test_cases = load_test_cases(args.config, args.test_case)
     
-    print_summary(report)
-    print(f"\n💾 Results saved to: {output_file}")
+    if not test_cases:
+        print("No test cases found")
+        return
+
+    pricing = load_pricing(args.pricing) if os.path.exists(args.pricing) else {}
+
+    try:
+        if len(runners) == 1:
+            asyncio.run(run_model(runners[0], test_cases, args, price=find_price(pricing, runners[0].model)))
+        else:
+            asyncio.run(run_sweep(runners, test_cases, args, pricing))
+    finally:
+        for runner in runners:
+            runner.close()
+        if judge is not None:
+            judge.close()
+        if judge_cache is not None:
+            judge_cache.close()
+
+    # Completed results are already saved; only now report a dead backend
+    tripped = [r.limiter for r in runners if r.limiter.circuit_open]
+    if tripped:
+        models = ", ".join(f"{limiter.name} ({limiter.tripped_after} failures in a row)" for limiter in tripped)
+        print(f"\n❌ Aborted: circuit breaker open for {models}")
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+"""Deterministic fuzzy matching of tool paths.
+
+Sits between the brittle (exact) match and the LLM judge, and accepts
+tool paths that differ from an expected variant only in ways that don't
+change the outcome:
+
+- product names that name the same thing: two names resolving to the
+  same PRODUCTS entry, or, for names that resolve to none, token-set
+  similarity ("blue shirt" / "Blue T-Shirt")
+- quantities given as strings or words ("2", "two") and category aliases
+  ("book", "gadgets")
+- independent cart updates made in a different order (for sequential
+  variants; partial-order variants keep their own constraints)
+- extra read-only calls (search_products, view_cart); the expected ones
+  keep their place relative to the cart updates they depend on
+
+Anything else is left to the judge.
+"""
+import re
+from dataclasses import dataclass
+
+from .models import ExpectedToolCall, ToolCall
+from .paths import compile_path
+from .tools import PRODUCTS
+
+# Tools that don't change the cart; calling them more often than expected is harmless
+READ_ONLY_TOOLS = {"search_products", "view_cart"}
+
+# Alternative names for the catalog's categories
+CATEGORY_ALIASES = {
+    "electronic": "electronics",
+    "electronics": "electronics",
+    "gadget": "electronics",
+    "tech": "electronics",
+    "technology": "electronics",
+    "device": "electronics",
+    "book": "books",
+    "books": "books",
+    "novel": "books",
+    "reading": "books",
+}
+
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+# Arguments that may stand in for another: search_products(query="books")
+# finds the same products as search_products(category="books")
+_ARGUMENT_ALTERNATIVES = {
+    ("search_products", "category"): ("category", "query"),
+}
+
+
+@dataclass
+class FuzzyMatchConfig:
+    """Thresholds for the fuzzy tier."""
+    enabled: bool = True
+    # Token-set (Jaccard) similarity at which two product names are the same
+    name_threshold: float = 0.6
+    # Similarity at which a name is resolved to a PRODUCTS entry
+    catalog_threshold: float = 0.6
+    # Read-only calls allowed beyond those in the expected variant
+    max_extra_reads: int = 2
+    # Accept independent calls in a different order; otherwise the
+    # expected calls must be made in order
+    allow_reorder: bool = True
+
+
+def _tokens(text: str) -> frozenset[str]:
+    """Lowercase word tokens, with a plural "s" removed."""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return frozenset(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words)
+
+
+def token_set_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the two strings' token sets."""
+    ta, tb = _tokens(a), _tokens(b)
+    if not ta or not tb:
+        return 1.0 if ta == tb else 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def catalog_product(name: str, threshold: float) -> str | None:
+    """The PRODUCTS key a product name refers to, or None if none (or several) fit."""
+    scores = {}
+    for key, product in PRODUCTS.items():
+        scores[key] = max(token_set_similarity(name, key), token_set_similarity(name, product["name"]))
+    best = max(scores.values())
+    if best < threshold:
+        return None
+    candidates = [key for key, score in scores.items() if score == best]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def _quantity(value) -> int | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text.isdigit():
+            return int(text)
+        return _NUMBER_WORDS.get(text)
+    return None
+
+
+def _category(value) -> str:
+    text = str(value).strip().lower()
+    return CATEGORY_ALIASES.get(text, text)
+
+
+def _values_match(key: str, expected, actual, config: FuzzyMatchConfig) -> bool:
+    if key == "quantity":
+        return _quantity(expected) is not None and _quantity(expected) == _quantity(actual)
+    if key == "category":
+        return _category(expected) == _category(actual)
+    if isinstance(expected, str) and isinstance(actual, str):
+        if key == "product_name":
+            # Similar names can still be different products ("Samsung Galaxy"
+            # and "Samsung Galaxy S24"), so the catalog decides when it can
+            expected_product = catalog_product(expected, config.catalog_threshold)
+            actual_product = catalog_product(actual, config.catalog_threshold)
+            if expected_product is not None or actual_product is not None:
+                return expected_product == actual_product
+        if token_set_similarity(expected, actual) >= config.name_threshold:
+            return True
+        return key == "query" and _category(expected) == _category(actual)
+    return expected == actual
+
+
+def call_matches(actual: ToolCall, expected: ExpectedToolCall, config: FuzzyMatchConfig) -> bool:
+    """Whether an actual call fuzzily satisfies an expected one."""
+    if actual.tool_name != expected.name:
+        return False
+    # None or empty expected arguments accept any arguments
+    for key, value in (expected.arguments or {}).items():
+        alternatives = _ARGUMENT_ALTERNATIVES.get((expected.name, key), (key,))
+        if not any(alt in actual.arguments and _values_match(alt, value, actual.arguments[alt], config)
+                   for alt in alternatives):
+            return False
+    return True
+
+
+def _product_of(call: ExpectedToolCall, config: FuzzyMatchConfig) -> str | None:
+    name = (call.arguments or {}).get("product_name")
+    if not isinstance(name, str):
+        return None
+    return catalog_product(name, config.catalog_threshold) or name.lower()
+
+
+def _commute(a: ExpectedToolCall, b: ExpectedToolCall, config: FuzzyMatchConfig) -> bool:
+    """Whether two calls can be made in either order with the same results."""
+    if "checkout" in (a.name, b.name):
+        return False
+    a_reads, b_reads = a.name in READ_ONLY_TOOLS, b.name in READ_ONLY_TOOLS
+    if a_reads and b_reads:
+        return True
+    if a_reads or b_reads:
+        # Search results don't depend on the cart; the cart view does
+        return "view_cart" not in (a.name, b.name)
+    product_a, product_b = _product_of(a, config), _product_of(b, config)
+    # A wildcard add_to_cart might touch any product
+    if product_a is None or product_b is None:
+        return a.name == b.name
+    return product_a != product_b
+
+
+def _assign_calls(
+    actual: list[ToolCall],
+    expected: list[ExpectedToolCall],
+    config: FuzzyMatchConfig,
+) -> bool:
+    """Pair every expected call with a distinct actual one.
+
+    Only pairs of expected calls that don't commute have to keep their
+    relative order. Actual calls left over must all be read-only, and at
+    most max_extra_reads of them.
+    """
+    surplus = len(actual) - len(expected)
+    if surplus < 0 or surplus > config.max_extra_reads:
+        return False
+    assigned: list[int] = []
+
+    def search(i: int) -> bool:
+        if i == len(expected):
+            taken = set(assigned)
+            return all(call.tool_name in READ_ONLY_TOOLS for j, call in enumerate(actual) if j not in taken)
+        for j, call in enumerate(actual):
+            if j in assigned or not call_matches(call, expected[i], config):
+                continue
+            # Earlier expected calls that don't commute with this one must come first
+            if any(assigned[k] > j and not _commute(expected[k], expected[i], config) for k in range(i)):
+                continue
+            assigned.append(j)
+            if search(i + 1):
+                return True
+            assigned.pop()
+        return False
+
+    return search(0)
+
+
+def fuzzy_match(
+    actual_calls: list[ToolCall],
+    expected_variants: list,
+    config: FuzzyMatchConfig | None = None,
+) -> str:
+    """Return the first variant the actual calls fuzzily match, or "" if none does."""
+    config = config or FuzzyMatchConfig()
+    if not config.enabled or not actual_calls:
+        return ""
+    for variant in expected_variants:
+        if not variant.tools:
+            continue
+        matcher = compile_path(variant)
+        if matcher.flexible or not config.allow_reorder:
+            # Keep the path's own order, allowing extra read-only calls anywhere
+            if matcher.match(
+                actual_calls,
+                lambda actual, expected: call_matches(actual, expected, config),
+                skippable=lambda call: call.tool_name in READ_ONLY_TOOLS,
+                max_skips=config.max_extra_reads,
+            ):
+                return variant.name
+            continue
+        if _assign_calls(actual_calls, variant.tools, config):
+            return variant.name
+    return ""
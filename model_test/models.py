@@ -1,3 +1,4 @@
+import json
 from dataclasses import dataclass, field
 from typing import Any
 from datetime import datetime
@@ -18,6 +19,11 @@ class InitialCartState:
 class ExpectedToolCall:
     name: str
     arguments: dict[str, Any] = field(default_factory=dict)
+    # Partial-order fields (see paths.py)
+    id: str = ""
+    after: list[str] = field(default_factory=list)
+    optional: bool = False
+    repeat: bool = False
 
 
 @dataclass
@@ -25,6 +31,8 @@ class ExpectedToolPath:
     name: str
     tools: list[ExpectedToolCall]
     description: str = ""
+    # Compiled paths.PathMatcher, set by load_test_cases
+    matcher: Any = field(default=None, repr=False, compare=False)
 
 
 @dataclass
@@ -33,6 +41,28 @@ class TestCase:
     prompt: str
     expected_tools_variants: list[ExpectedToolPath]
     initial_cart_state: InitialCartState | None = None
+    # Per-test overrides of the suite's AgentBudget
+    max_rounds: int | None = None
+    time_budget: float | None = None
+
+
+@dataclass
+class AgentBudget:
+    """How long an agent test may run before it is stopped and failed."""
+    max_rounds: int = 10
+    # Seconds of LLM time; None for no limit
+    time_budget: float | None = None
+    # Consecutive rounds that only repeat tool calls already made, with the
+    # same results, before the test is stopped; 0 disables loop detection
+    loop_patience: int = 2
+
+    def for_test(self, test_case: TestCase) -> "AgentBudget":
+        """This budget with a test case's own limits applied."""
+        return AgentBudget(
+            max_rounds=test_case.max_rounds or self.max_rounds,
+            time_budget=test_case.time_budget if test_case.time_budget is not None else self.time_budget,
+            loop_patience=self.loop_patience,
+        )
 
 
 @dataclass
@@ -41,12 +71,113 @@ class ToolCall:
     arguments: dict[str, Any]
 
 
+@dataclass(slots=True)
+class ToolCallRequest:
+    """A tool call requested in a model turn, as returned by any backend."""
+    id: str
+    name: str
+    # Parsed once, when the backend's response is normalised; None if the
+    # model sent malformed JSON (see arguments_error)
+    arguments: dict[str, Any] | None
+    # The JSON text the model sent; "" when the backend returned structured
+    # arguments (Bedrock, Vertex AI)
+    arguments_json: str = ""
+    arguments_error: str = ""
+
+    def json_arguments(self) -> str:
+        """Arguments as JSON text, for OpenAI-format messages."""
+        if self.arguments_json or self.arguments is None:
+            return self.arguments_json
+        return json.dumps(self.arguments)
+
+    def structured_arguments(self) -> dict[str, Any]:
+        """Arguments as a dict, for Bedrock and Vertex AI messages; {} if malformed."""
+        return self.arguments if self.arguments is not None else {}
+
+
+@dataclass(slots=True)
+class Completion:
+    """One assistant turn, normalised across backends.
+
+    The agent loop appends it to the conversation as is; each backend
+    converts it to its own message format.
+    """
+    content: str = ""
+    tool_calls: list[ToolCallRequest] = field(default_factory=list)
+    usage: "TokenUsage | None" = None
+    # Seconds to the first token, when streaming
+    ttft: float | None = None
+    # The backend's response object, for debugging
+    raw: Any = field(default=None, repr=False, compare=False)
+    role: str = "assistant"
+    _openai: dict | None = field(default=None, init=False, repr=False, compare=False)
+
+    def to_openai(self) -> dict:
+        """The turn as an OpenAI chat message (built once)."""
+        if self._openai is None:
+            self._openai = {"role": "assistant", "content": self.content or None}
+            if self.tool_calls:
+                self._openai["tool_calls"] = [
+                    {"id": tc.id, "type": "function", "function": {"name": tc.name, "arguments": tc.json_arguments()}}
+                    for tc in self.tool_calls
+                ]
+        return self._openai
+
+
+@dataclass
+class TokenUsage:
+    # prompt_tokens includes cached_tokens (cache reads) and
+    # cache_write_tokens on every backend
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    def __add__(self, other: "TokenUsage") -> "TokenUsage":
+        return TokenUsage(
+            prompt_tokens=self.prompt_tokens + other.prompt_tokens,
+            completion_tokens=self.completion_tokens + other.completion_tokens,
+            cached_tokens=self.cached_tokens + other.cached_tokens,
+            cache_write_tokens=self.cache_write_tokens + other.cache_write_tokens,
+        )
+
+
+@dataclass
+class RoundMetrics:
+    llm_time: float
+    ttft: float | None = None
+    output_tokens: int | None = None
+    output_tokens_per_sec: float | None = None
+    usage: TokenUsage | None = None
+    # Seconds per harness phase: build, network, parse, tools
+    phases: dict[str, float] = field(default_factory=dict)
+
+
 @dataclass
 class AgentResponse:
     tool_calls: list[ToolCall]
     llm_requests: int
     llm_total_time: float
     final_message: str = ""
+    rounds: list[RoundMetrics] = field(default_factory=list)
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    # Why the conversation ended: "completed" (the model answered),
+    # "max_rounds", "time_budget", "loop" or "no_progress"
+    stop_reason: str = "completed"
+
+
+@dataclass
+class JudgeVerdict:
+    success: bool
+    matched_variant: str = ""
+    reasoning: str = ""
+    judge_model: str = ""
+    # "hit" or "miss" when the judge cache is enabled, "" otherwise
+    cache: str = ""
+    error: bool = False
+    # Seconds spent waiting on the judge (0 for cache hits; a packed
+    # call's latency is split across its cases)
+    latency: float = 0.0
 
 
 @dataclass
@@ -57,6 +188,28 @@ class AgentTestResult:
     response: AgentResponse | None = None
     matched_path: str = ""
     error_message: str = ""
+    cost: float | None = None
+    judge_time: float = 0.0
+    judge: JudgeVerdict | None = None
+    # Matching tier that decided: "brittle", "fuzzy" or "judge" ("" on error)
+    match_tier: str = ""
+    # Default judge's verdict on the same case, with --judge-compare
+    reference_judge: JudgeVerdict | None = None
+    # AgentResponse.stop_reason, or "error" if a request failed
+    stop_reason: str = ""
+
+
+@dataclass
+class BatchRound:
+    """One round of the batched (--batched) mode: every active conversation's next request."""
+    round: int
+    requests: int
+    wall_time: float
+    completion_tokens: int = 0
+
+    @property
+    def tokens_per_sec(self) -> float | None:
+        return self.completion_tokens / self.wall_time if self.wall_time > 0 else None
 
 
 @dataclass
@@ -68,3 +221,25 @@ class AgentReport:
     failed_tests: int
     total_llm_time: float
     avg_time_per_req: float
+    wall_time: float = 0.0
+    concurrency: int = 1
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    total_cost: float | None = None
+    # Summed seconds per phase across all rounds, plus "judge"
+    phases: dict[str, float] = field(default_factory=dict)
+    judge_cache_hits: int = 0
+    judge_cache_misses: int = 0
+    judge_model: str = ""
+    # Mean judge latency per test that wasn't answered from the cache
+    judge_latency: float | None = None
+    # Verdicts compared with the default judge (--judge-compare) and how many agreed
+    judge_compared: int = 0
+    judge_agreed: int = 0
+    # Number of tests decided by each matching tier
+    match_tiers: dict[str, int] = field(default_factory=dict)
+    # Number of tests stopped for each reason other than "completed"
+    stop_reasons: dict[str, int] = field(default_factory=dict)
+    # Batched mode: the rounds of the batch this run was part of (shared by
+    # all runs in it) and its completion tokens per second of round time
+    batch_rounds: list[BatchRound] = field(default_factory=list)
+    batch_tokens_per_sec: float | None = None
@@ -0,0 +1,192 @@
+"""Partial-order expected tool paths.
+
+A step in an expected path may carry these fields besides name and
+arguments:
+
+- "id": a name other steps can refer to
+- "after": ids of the steps it must follow
+- "optional": the step may be left out
+- "repeat": the step may be made more than once
+
+If no step in a variant uses "after", the steps are a sequence: each one
+follows the step before it, so plain variants keep their old meaning and
+optional/repeat can still be used in them. Once any step uses "after",
+only the listed constraints apply.
+
+For example, "view the cart, optionally search, then add" is
+
+    [{"id": "view", "name": "view_cart"},
+     {"id": "search", "name": "search_products", "after": ["view"], "optional": true},
+     {"name": "add_to_cart", "after": ["view", "search"]}]
+
+An optional step that hasn't happened yet when a later step starts can no
+longer happen.
+"""
+from collections.abc import Callable
+
+from .models import ExpectedToolCall, ExpectedToolPath, ToolCall
+
+CallMatcher = Callable[[ToolCall, ExpectedToolCall], bool]
+
+# Most flat sequences a partial-order variant is expanded into for the results file
+EXPANSION_LIMIT = 24
+
+
+class PathMatcher:
+    """An expected path compiled into predecessor lists, matched in one pass.
+
+    Each actual call is assigned to an eligible step it matches. When
+    several steps qualify, a step not yet taken beats a repeat, and a step
+    with more expected arguments beats a less specific one. Matching takes
+    O(calls x steps); the choice is greedy, so steps that could take the
+    same call should be made distinguishable by their arguments.
+    """
+
+    def __init__(self, variant: ExpectedToolPath):
+        steps = variant.tools
+        self.steps = steps
+        ids = {}
+        for i, step in enumerate(steps):
+            if step.id:
+                if step.id in ids:
+                    raise ValueError(f"Variant {variant.name!r}: duplicate step id {step.id!r}")
+                ids[step.id] = i
+
+        self.partial_order = any(step.after for step in steps)
+        if self.partial_order:
+            self.predecessors = []
+            for step in steps:
+                unknown = [ref for ref in step.after if ref not in ids]
+                if unknown:
+                    raise ValueError(f"Variant {variant.name!r}: step {step.name!r} is after unknown ids {unknown}")
+                self.predecessors.append([ids[ref] for ref in step.after])
+        else:
+            self.predecessors = [[i - 1] if i else [] for i in range(len(steps))]
+
+        # Steps that must all be closed once a step is taken
+        self.ancestors = [self._ancestors(i, variant.name) for i in range(len(steps))]
+        # Required steps that must have happened before a step, looking
+        # through optional predecessors
+        self.required = [self._required(i) for i in range(len(steps))]
+        # Preference order: most specific first, then declaration order
+        self.order = sorted(range(len(steps)), key=lambda i: -len(steps[i].arguments or {}))
+        self.flexible = self.partial_order or any(step.optional or step.repeat for step in steps)
+
+    def _ancestors(self, index: int, variant_name: str) -> frozenset[int]:
+        seen = set()
+        stack = list(self.predecessors[index])
+        while stack:
+            i = stack.pop()
+            if i == index:
+                raise ValueError(f"Variant {variant_name!r}: step {self.steps[index].name!r} is in an ordering cycle")
+            if i not in seen:
+                seen.add(i)
+                stack.extend(self.predecessors[i])
+        return frozenset(seen)
+
+    def _required(self, index: int) -> frozenset[int]:
+        required = set()
+        for p in self.predecessors[index]:
+            required |= self._required(p) if self.steps[p].optional else {p}
+        return frozenset(required)
+
+    def match(
+        self,
+        actual_calls: list[ToolCall],
+        call_matches: CallMatcher,
+        skippable: Callable[[ToolCall], bool] | None = None,
+        max_skips: int = 0,
+    ) -> bool:
+        """Whether the calls follow this path.
+
+        Calls that fit no step are allowed only if `skippable` accepts them,
+        at most `max_skips` times.
+        """
+        counts = [0] * len(self.steps)
+        closed = [False] * len(self.steps)
+        skips = 0
+        for call in actual_calls:
+            chosen = None
+            for i in self.order:
+                step = self.steps[i]
+                if closed[i] or (counts[i] and not step.repeat):
+                    continue
+                if not all(counts[r] for r in self.required[i]):
+                    continue
+                if not call_matches(call, step):
+                    continue
+                if not counts[i]:
+                    chosen = i
+                    break
+                if chosen is None:
+                    chosen = i
+            if chosen is None:
+                if skippable is None or not skippable(call) or skips >= max_skips:
+                    return False
+                skips += 1
+                continue
+            counts[chosen] += 1
+            for i in self.ancestors[chosen]:
+                closed[i] = True
+        return all(counts[i] or step.optional for i, step in enumerate(self.steps))
+
+    def linearizations(self, limit: int) -> list[list[ExpectedToolCall]]:
+        """Up to `limit` flat call sequences this path accepts.
+
+        Optional steps appear both taken and skipped; repeatable steps are
+        taken once.
+        """
+        if not self.flexible:
+            return [list(self.steps)]
+        sequences: list[list[ExpectedToolCall]] = []
+
+        def extend(done: frozenset[int], skipped: frozenset[int], sequence: list[ExpectedToolCall]):
+            if len(sequences) >= limit:
+                return
+            remaining = [i for i in range(len(self.steps)) if i not in done and i not in skipped]
+            if not remaining:
+                sequences.append(sequence)
+                return
+            for i in remaining:
+                if any(p not in done and p not in skipped for p in self.predecessors[i]):
+                    continue
+                extend(done | {i}, skipped, sequence + [self.steps[i]])
+                if self.steps[i].optional:
+                    extend(done, skipped | {i}, sequence)
+
+        extend(frozenset(), frozenset(), [])
+        # Skipping optional steps in different positions yields duplicates
+        unique = []
+        for sequence in sequences:
+            if sequence not in unique:
+                unique.append(sequence)
+        return unique
+
+
+def compile_path(variant: ExpectedToolPath) -> PathMatcher:
+    """Compile a variant's matcher (cached on the variant)."""
+    if variant.matcher is None:
+        variant.matcher = PathMatcher(variant)
+    return variant.matcher
+
+
+def step_constraints(step: ExpectedToolCall) -> dict:
+    """The partial-order fields a step sets, for output."""
+    constraints = {}
+    if step.id:
+        constraints["id"] = step.id
+    if step.after:
+        constraints["after"] = step.after
+    if step.optional:
+        constraints["optional"] = True
+    if step.repeat:
+        constraints["repeat"] = True
+    return constraints
+
+
+def flat_variants(variant: ExpectedToolPath, limit: int = EXPANSION_LIMIT) -> list[tuple[str, list[ExpectedToolCall]]]:
+    """(name, steps) for each flat sequence a variant accepts; a plain variant is returned as is."""
+    sequences = compile_path(variant).linearizations(limit)
+    if len(sequences) == 1:
+        return [(variant.name, sequences[0])]
+    return [(f"{variant.name}#{k}", sequence) for k, sequence in enumerate(sequences, 1)]
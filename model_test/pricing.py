@@ -0,0 +1,43 @@
+import json
+from dataclasses import dataclass
+
+from .models import TokenUsage
+
+
+@dataclass
+class ModelPrice:
+    """USD per million tokens."""
+    input: float
+    output: float
+    cached_input: float | None = None
+    cache_write: float | None = None
+
+
+def load_pricing(path: str) -> dict[str, ModelPrice]:
+    """Load the pricing table from a JSON file."""
+    with open(path) as f:
+        data = json.load(f)
+    return {key: ModelPrice(**price) for key, price in data.get("models", {}).items()}
+
+
+def find_price(pricing: dict[str, ModelPrice], model: str) -> ModelPrice | None:
+    """Find the price for a model ID: exact key first, then longest substring key."""
+    if model in pricing:
+        return pricing[model]
+    matches = [key for key in pricing if key in model]
+    if not matches:
+        return None
+    return pricing[max(matches, key=len)]
+
+
+def usage_cost(usage: TokenUsage, price: ModelPrice) -> float:
+    """Cost in USD of the given token usage."""
+    cached_rate = price.cached_input if price.cached_input is not None else price.input
+    write_rate = price.cache_write if price.cache_write is not None else price.input
+    uncached = usage.prompt_tokens - usage.cached_tokens - usage.cache_write_tokens
+    return (
+        uncached * price.input
+        + usage.cached_tokens * cached_rate
+        + usage.cache_write_tokens * write_rate
+        + usage.completion_tokens * price.output
+    ) / 1_000_000
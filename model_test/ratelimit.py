@@ -0,0 +1,228 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class RateLimitConfig:
+    """Per-backend request shaping and retry settings."""
+    requests_per_second: float | None = None
+    tokens_per_minute: float | None = None
+    max_concurrency: int = 16
+    min_concurrency: int = 1
+    max_retries: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    failure_threshold: int = 10
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a backend has failed persistently and calls are refused."""
+
+
+class _TokenBucket:
+    """Token bucket using reservations, so no lock is needed on one loop.
+
+    Callers reserve their amount immediately (the level may go negative)
+    and sleep until the bucket would have refilled to cover it.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` from the bucket and return how long to wait for it."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+
+class BackendLimiter:
+    """Rate limiter, AIMD concurrency gate, retrier and circuit breaker.
+
+    - Requests/sec and tokens/min are enforced with token buckets.
+    - In-flight requests are capped by a limit that grows by roughly one per
+      window of successful calls and halves on throttling (AIMD).
+    - Throttling and transient errors are retried with full-jitter
+      exponential backoff.
+    - After `failure_threshold` consecutive calls exhaust their retries on
+      throttling or transient errors, the circuit opens and every further
+      call raises CircuitOpenError. Fatal errors (bad credentials, unknown
+      model) fail only the call that hit them and don't count.
+
+    Each model gets its own limiter (see get_limiter), so one model's
+    throttling or outage doesn't hold back another on the same backend.
+    """
+
+    def __init__(self, name: str, config: RateLimitConfig | None = None):
+        self.name = name
+        self.config = config or RateLimitConfig()
+        self.limit = float(self.config.max_concurrency)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.circuit_open = False
+        # Failures in a row that opened the circuit
+        self.tripped_after = 0
+        self.retries = 0
+        self.throttles = 0
+        self._request_bucket = None
+        self._token_bucket = None
+        if self.config.requests_per_second:
+            rps = self.config.requests_per_second
+            self._request_bucket = _TokenBucket(rps, max(rps, 1.0))
+        if self.config.tokens_per_minute:
+            tpm = self.config.tokens_per_minute
+            self._token_bucket = _TokenBucket(tpm / 60.0, tpm)
+        # asyncio primitives are bound to one event loop; keep one per loop
+        self._conditions = weakref.WeakKeyDictionary()
+        # Buckets are also drawn from by blocking calls on worker threads
+        self._bucket_lock = threading.Lock()
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        condition = self._conditions.get(loop)
+        if condition is None:
+            condition = asyncio.Condition()
+            self._conditions[loop] = condition
+        return condition
+
+    async def _acquire(self, tokens: int):
+        condition = self._condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < max(int(self.limit), 1))
+            self.in_flight += 1
+
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _reserve(self, tokens: int) -> float:
+        """Take a request (and `tokens`) from the buckets; returns how long to wait."""
+        delay = 0.0
+        with self._bucket_lock:
+            if self._request_bucket:
+                delay = max(delay, self._request_bucket.reserve(1))
+            if self._token_bucket and tokens:
+                delay = max(delay, self._token_bucket.reserve(tokens))
+        return delay
+
+    async def _release(self, throttled: bool):
+        condition = self._condition()
+        async with condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.config.min_concurrency), self.limit / 2)
+            else:
+                self.limit = min(float(self.config.max_concurrency), self.limit + 1 / max(self.limit, 1.0))
+            condition.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.config.max_delay, self.config.base_delay * 2 ** attempt))
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        classify: Callable[[Exception], str | None] = lambda exc: None,
+    ) -> T:
+        """Call `fn` under the limiter, retrying throttled/transient failures.
+
+        `classify` maps an exception to "throttle", "transient", "fatal" or
+        None (not a backend error). Only the first two are retried, and only
+        they count towards opening the circuit once the retries run out.
+        """
+        if self.circuit_open:
+            raise CircuitOpenError(f"{self.name}: circuit open after {self.tripped_after} consecutive failures")
+
+        attempt = 0
+        while True:
+            await self._acquire(tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                kind = classify(e)
+                await self._release(throttled=kind == "throttle")
+                if kind == "throttle":
+                    self.throttles += 1
+                if kind in ("throttle", "transient") and attempt < self.config.max_retries:
+                    delay = self._backoff(attempt)
+                    attempt += 1
+                    self.retries += 1
+                    print(f"  ⏳ {self.name}: {kind} error ({e}); retry {attempt}/{self.config.max_retries} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                if kind in ("throttle", "transient"):
+                    self._record_failure()
+                raise
+            await self._release(throttled=False)
+            self.consecutive_failures = 0
+            return result
+
+    def call_blocking(
+        self,
+        fn: Callable[[], T],
+        tokens: int = 0,
+        classify: Callable[[Exception], str | None] = lambda exc: None,
+    ) -> T:
+        """Blocking version of `call`, for calls made on worker threads (the LLM judge).
+
+        Uses the same rate buckets, retries and circuit breaker. The
+        concurrency gate belongs to the event loop, so the caller's thread
+        pool bounds concurrency instead.
+        """
+        if self.circuit_open:
+            raise CircuitOpenError(f"{self.name}: circuit open after {self.tripped_after} consecutive failures")
+
+        attempt = 0
+        while True:
+            delay = self._reserve(tokens)
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                result = fn()
+            except Exception as e:
+                kind = classify(e)
+                if kind == "throttle":
+                    self.throttles += 1
+                if kind in ("throttle", "transient") and attempt < self.config.max_retries:
+                    delay = self._backoff(attempt)
+                    attempt += 1
+                    self.retries += 1
+                    print(f"  ⏳ {self.name}: {kind} error ({e}); retry {attempt}/{self.config.max_retries} in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                if kind in ("throttle", "transient"):
+                    self._record_failure()
+                raise
+            self.consecutive_failures = 0
+            return result
+
+    def _record_failure(self):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.config.failure_threshold and not self.circuit_open:
+            self.circuit_open = True
+            self.tripped_after = self.consecutive_failures
+
+
+# One limiter per model, shared by every runner of that model in the process
+_limiters: dict[str, BackendLimiter] = {}
+
+
+def get_limiter(model: str, config: RateLimitConfig | None = None) -> BackendLimiter:
+    """Return the shared limiter for a model (its --model spec), creating it on first use."""
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = BackendLimiter(model, config)
+        _limiters[model] = limiter
+    return limiter
@@ -0,0 +1,17 @@
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """Accumulates monotonic wall time per named phase."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
@@ -1,3 +1,8 @@
+from collections.abc import Callable
+from typing import Any
+
+from .catalog import Catalog, SqliteCatalog
+
 PRODUCTS = {
     "iPhone": {"name": "iPhone", "price": 999.99, "category": "electronics"},
     "iPhone 15": {"name": "iPhone 15", "price": 1099.99, "category": "electronics"},
@@ -16,31 +21,22 @@ PRODUCTS = {
 }
 
 
-def search_products(query: str = "", category: str = "") -> list[dict]:
-    """Search for products by query or category."""
-    results = []
-    query_lower = query.lower()
-
-    for product in PRODUCTS.values():
-        # If query is provided, search in both name and category
-        if query:
-            name_match = query_lower in product["name"].lower()
-            category_match = query_lower in product["category"].lower()
-            if not (name_match or category_match):
-                continue
-
-        # If category is explicitly specified, must match exactly
-        if category and category.lower() != product["category"].lower():
-            continue
+# The default fixture: every match, in PRODUCTS order, so results (and
+# recorded cassettes) are the same as before catalogs were indexed
+DEFAULT_CATALOG = Catalog(PRODUCTS, limit=None, ranked=False)
 
-        results.append(product)
 
-    return results
+def search_products(
+    query: str = "", category: str = "", catalog: Catalog | SqliteCatalog = DEFAULT_CATALOG
+) -> list[dict]:
+    """Search for products by query or category."""
+    return catalog.search(query, category)[0]
 
 
 class CartService:
-    def __init__(self):
+    def __init__(self, catalog: Catalog | SqliteCatalog = DEFAULT_CATALOG):
         self.items: dict[str, int] = {}
+        self.catalog = catalog
     
     def add_to_cart(self, product_name: str, quantity: int = 1) -> dict:
         """Add product to cart."""
@@ -57,14 +53,14 @@ class CartService:
     def view_cart(self) -> dict:
         """View cart contents."""
         items = [{"product_name": name, "quantity": qty} for name, qty in self.items.items()]
-        total = sum(PRODUCTS.get(name, {}).get("price", 0) * qty for name, qty in self.items.items())
+        total = sum(self.catalog.price(name) * qty for name, qty in self.items.items())
         return {"items": items, "total": total}
     
     def checkout(self) -> dict:
         """Process checkout."""
         if not self.items:
             return {"success": False, "message": "Cart is empty"}
-        total = sum(PRODUCTS.get(name, {}).get("price", 0) * qty for name, qty in self.items.items())
+        total = sum(self.catalog.price(name) * qty for name, qty in self.items.items())
         self.items.clear()
         return {"success": True, "message": f"Checkout complete. Total: ${total:.2f}"}
 
@@ -132,21 +128,136 @@ TOOLS = [
 ]
 
 
+def _to_string(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f"expected a string, got {value!r}")
+
+
+def _to_integer(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"expected an integer, got {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.lstrip("+-").isdigit():
+            return int(text)
+    raise ValueError(f"expected an integer, got {value!r}")
+
+
+def _to_number(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise ValueError(f"expected a number, got {value!r}")
+
+
+def _to_boolean(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise ValueError(f"expected a boolean, got {value!r}")
+
+
+_COERCERS = {"string": _to_string, "integer": _to_integer, "number": _to_number, "boolean": _to_boolean}
+
+ArgumentValidator = Callable[[Any], tuple[dict, list[str]]]
+
+
+def compile_validator(parameters: dict) -> ArgumentValidator:
+    """Compile a tool's JSON parameter schema into a validator.
+
+    The validator takes the arguments a model sent and returns (arguments
+    to call the tool with, errors). Values are coerced to the declared
+    type where that is unambiguous ("2" -> 2 for an integer); unknown keys
+    and nulls are dropped, and defaults are filled in.
+    """
+    properties = parameters.get("properties", {})
+    coercers = {name: _COERCERS.get(prop.get("type"), lambda value: value) for name, prop in properties.items()}
+    defaults = {name: prop["default"] for name, prop in properties.items() if "default" in prop}
+    required = [name for name in parameters.get("required", ()) if name in properties]
+
+    def validate(arguments) -> tuple[dict, list[str]]:
+        if not isinstance(arguments, dict):
+            return {}, [f"arguments must be a JSON object, got {arguments!r}"]
+        values = dict(defaults)
+        errors = {}
+        for name, value in arguments.items():
+            coerce = coercers.get(name)
+            if coerce is None or value is None:
+                continue
+            try:
+                values[name] = coerce(value)
+            except ValueError as e:
+                errors[name] = str(e)
+        for name in required:
+            if name not in values and name not in errors:
+                errors[name] = "required"
+        return values, [f"{name}: {error}" for name, error in errors.items()]
+
+    return validate
+
+
+def _search_products(cart: CartService, query: str = "", category: str = "") -> str:
+    results, total = cart.catalog.search(query, category)
+    if total > len(results):
+        return f"Found {total} products, showing the top {len(results)}: {[p['name'] for p in results]}"
+    return f"Found {len(results)} products: {[p['name'] for p in results]}"
+
+
+def _add_to_cart(cart: CartService, product_name: str, quantity: int = 1) -> str:
+    return cart.add_to_cart(product_name, quantity)["message"]
+
+
+def _remove_from_cart(cart: CartService, product_name: str) -> str:
+    return cart.remove_from_cart(product_name)["message"]
+
+
+def _view_cart(cart: CartService) -> str:
+    result = cart.view_cart()
+    return f"Cart: {result['items']}, Total: ${result['total']:.2f}"
+
+
+def _checkout(cart: CartService) -> str:
+    return cart.checkout()["message"]
+
+
+_HANDLERS = {
+    "search_products": _search_products,
+    "add_to_cart": _add_to_cart,
+    "remove_from_cart": _remove_from_cart,
+    "view_cart": _view_cart,
+    "checkout": _checkout,
+}
+
+# Tool name -> (argument validator, handler), built once from TOOLS
+TOOL_DISPATCH: dict[str, tuple[ArgumentValidator, Callable[..., str]]] = {
+    tool["function"]["name"]: (compile_validator(tool["function"]["parameters"]), _HANDLERS[tool["function"]["name"]])
+    for tool in TOOLS
+}
+
+
 def execute_tool(tool_name: str, arguments: dict, cart: CartService) -> str:
-    """Execute a tool and return the result."""
-    if tool_name == "search_products":
-        results = search_products(**arguments)
-        return f"Found {len(results)} products: {[p['name'] for p in results]}"
-    elif tool_name == "add_to_cart":
-        result = cart.add_to_cart(**arguments)
-        return result["message"]
-    elif tool_name == "remove_from_cart":
-        result = cart.remove_from_cart(**arguments)
-        return result["message"]
-    elif tool_name == "view_cart":
-        result = cart.view_cart()
-        return f"Cart: {result['items']}, Total: ${result['total']:.2f}"
-    elif tool_name == "checkout":
-        result = cart.checkout()
-        return result["message"]
-    return "Unknown tool"
+    """Execute a tool and return the result.
+
+    Arguments that don't fit the tool's schema are reported back as the
+    result, so the model can correct the call instead of the test failing.
+    """
+    dispatch = TOOL_DISPATCH.get(tool_name)
+    if dispatch is None:
+        return "Unknown tool"
+    validate, handler = dispatch
+    values, errors = validate(arguments)
+    if errors:
+        return f"Error: invalid arguments for {tool_name}: {'; '.join(errors)}"
+    return handler(cart, **values)
@@ -0,0 +1,101 @@
+from model_test.matching import FuzzyMatchConfig, call_matches, fuzzy_match
+from model_test.models import ExpectedToolCall, ExpectedToolPath, ToolCall
+
+
+def call(name, **arguments):
+    return ToolCall(tool_name=name, arguments=arguments)
+
+
+def step(name, **arguments):
+    return ExpectedToolCall(name=name, arguments=arguments)
+
+
+def variant(*steps):
+    return ExpectedToolPath(name="v", tools=list(steps))
+
+
+def product_matches(expected, actual):
+    return call_matches(call("add_to_cart", product_name=actual), step("add_to_cart", product_name=expected),
+                        FuzzyMatchConfig())
+
+
+def test_similar_names_of_different_products_do_not_match():
+    assert not product_matches("Samsung Galaxy", "Samsung Galaxy S24")
+    assert not product_matches("Samsung Galaxy S24", "Samsung Galaxy")
+    assert not product_matches("iPhone", "iPhone 15")
+
+
+def test_names_resolving_to_the_same_product_match():
+    assert product_matches("Programming Book", "book on programming")
+    assert product_matches("Wireless Headphones", "wireless headphone")
+
+
+def test_names_outside_the_catalog_fall_back_to_token_similarity():
+    assert product_matches("blue shirt", "Blue T-Shirt")
+    assert not product_matches("blue shirt", "red hat")
+
+
+def test_name_resolving_on_one_side_only_does_not_match():
+    assert not product_matches("Laptop", "Bose QC45")
+
+
+def test_quantity_and_category_normalisation():
+    config = FuzzyMatchConfig()
+    assert call_matches(call("add_to_cart", product_name="iPhone", quantity="two"),
+                        step("add_to_cart", product_name="iPhone", quantity=2), config)
+    assert call_matches(call("search_products", query="book"), step("search_products", category="books"), config)
+
+
+def test_wrong_product_in_cart_update_fails():
+    expected = [variant(step("add_to_cart", product_name="Samsung Galaxy"))]
+    assert fuzzy_match([call("add_to_cart", product_name="Samsung Galaxy S24")], expected) == ""
+    expected = [variant(step("remove_from_cart", product_name="iPhone 15"))]
+    assert fuzzy_match([call("remove_from_cart", product_name="iPhone")], expected) == ""
+
+
+def test_independent_updates_may_be_reordered():
+    expected = [variant(step("add_to_cart", product_name="iPhone"), step("add_to_cart", product_name="Laptop"))]
+    actual = [call("add_to_cart", product_name="Laptop"), call("add_to_cart", product_name="iPhone")]
+    assert fuzzy_match(actual, expected) == "v"
+    assert fuzzy_match(actual, expected, FuzzyMatchConfig(allow_reorder=False)) == ""
+
+
+def test_updates_to_the_same_product_keep_their_order():
+    expected = [variant(step("add_to_cart", product_name="iPhone"), step("remove_from_cart", product_name="iPhone"))]
+    actual = [call("remove_from_cart", product_name="iPhone"), call("add_to_cart", product_name="iPhone")]
+    assert fuzzy_match(actual, expected) == ""
+
+
+def test_view_cart_keeps_its_place_between_updates():
+    expected = [variant(step("add_to_cart", product_name="iPhone"), step("view_cart"))]
+    assert fuzzy_match([call("view_cart"), call("add_to_cart", product_name="iPhone")], expected) == ""
+    assert fuzzy_match([call("add_to_cart", product_name="iPhone"), call("view_cart")], expected) == "v"
+
+
+def test_view_cart_after_checkout_does_not_count():
+    expected = [variant(step("add_to_cart", product_name="iPhone"), step("view_cart"), step("checkout"))]
+    actual = [call("add_to_cart", product_name="iPhone"), call("checkout"), call("view_cart")]
+    assert fuzzy_match(actual, expected) == ""
+
+
+def test_search_may_move_relative_to_updates_but_not_checkout():
+    expected = [variant(step("search_products", query="laptop"), step("add_to_cart", product_name="Laptop"),
+                        step("checkout"))]
+    actual = [call("add_to_cart", product_name="Laptop"), call("search_products", query="laptop"), call("checkout")]
+    assert fuzzy_match(actual, expected) == "v"
+    actual = [call("add_to_cart", product_name="Laptop"), call("checkout"), call("search_products", query="laptop")]
+    assert fuzzy_match(actual, expected) == ""
+
+
+def test_extra_reads_float_up_to_the_limit():
+    expected = [variant(step("add_to_cart", product_name="iPhone"), step("checkout"))]
+    actual = [call("view_cart"), call("add_to_cart", product_name="iPhone"), call("view_cart"), call("checkout")]
+    assert fuzzy_match(actual, expected) == "v"
+    too_many = [call("view_cart")] * 3 + actual[1:2] + [call("checkout")]
+    assert fuzzy_match(too_many, expected) == ""
+
+
+def test_extra_writes_are_not_tolerated():
+    expected = [variant(step("add_to_cart", product_name="iPhone"))]
+    actual = [call("add_to_cart", product_name="iPhone"), call("add_to_cart", product_name="Laptop")]
+    assert fuzzy_match(actual, expected) == ""
@@ -0,0 +1,126 @@
+import pytest
+
+from model_test import runner
+from model_test.models import ExpectedToolCall, ExpectedToolPath, ToolCall
+from model_test.paths import PathMatcher, flat_variants
+
+
+def call(name, **arguments):
+    return ToolCall(tool_name=name, arguments=arguments)
+
+
+def step(name, arguments=None, **fields):
+    return ExpectedToolCall(name=name, arguments=arguments, **fields)
+
+
+def matches(steps, calls):
+    return PathMatcher(ExpectedToolPath(name="v", tools=steps)).match(calls, runner.TestRunner._brittle_call_matches)
+
+
+SEARCH = call("search_products", category="electronics")
+ADD_IPHONE = call("add_to_cart", product_name="iPhone 15")
+ADD_HEADPHONES = call("add_to_cart", product_name="Wireless Headphones")
+VIEW = call("view_cart")
+CHECKOUT = call("checkout")
+
+# Search, then both items in either order, then view the cart, then checkout
+EITHER_ORDER = [
+    step("search_products", {"category": "electronics"}, id="search"),
+    step("add_to_cart", {"product_name": "Wireless Headphones"}, id="headphones", after=["search"]),
+    step("add_to_cart", {"product_name": "iPhone 15"}, id="iphone", after=["search"]),
+    step("view_cart", {}, id="view", after=["headphones", "iphone"]),
+    step("checkout", {}, after=["view"]),
+]
+
+
+def test_plain_variant_is_a_sequence():
+    steps = [step("search_products", {"category": "electronics"}), step("add_to_cart", {"product_name": "iPhone 15"})]
+    assert matches(steps, [SEARCH, ADD_IPHONE])
+    assert not matches(steps, [ADD_IPHONE, SEARCH])
+    assert not matches(steps, [SEARCH])
+    assert not matches(steps, [SEARCH, ADD_IPHONE, ADD_IPHONE])
+
+
+def test_after_allows_any_order_of_unordered_steps():
+    assert matches(EITHER_ORDER, [SEARCH, ADD_HEADPHONES, ADD_IPHONE, VIEW, CHECKOUT])
+    assert matches(EITHER_ORDER, [SEARCH, ADD_IPHONE, ADD_HEADPHONES, VIEW, CHECKOUT])
+
+
+def test_after_keeps_listed_constraints():
+    assert not matches(EITHER_ORDER, [ADD_IPHONE, SEARCH, ADD_HEADPHONES, VIEW, CHECKOUT])
+    assert not matches(EITHER_ORDER, [SEARCH, ADD_IPHONE, VIEW, ADD_HEADPHONES, CHECKOUT])
+    assert not matches(EITHER_ORDER, [SEARCH, ADD_IPHONE, ADD_HEADPHONES, CHECKOUT, VIEW])
+
+
+def test_after_keeps_product_constraints():
+    add_laptop = call("add_to_cart", product_name="Laptop")
+    assert not matches(EITHER_ORDER, [SEARCH, add_laptop, ADD_IPHONE, VIEW, CHECKOUT])
+
+
+def test_optional_step_may_be_left_out():
+    steps = [
+        step("view_cart", {}, id="view"),
+        step("search_products", {}, id="search", after=["view"], optional=True),
+        step("add_to_cart", {"product_name": "iPhone 15"}, after=["view", "search"]),
+    ]
+    assert matches(steps, [VIEW, SEARCH, ADD_IPHONE])
+    assert matches(steps, [VIEW, ADD_IPHONE])
+    assert not matches(steps, [ADD_IPHONE])
+
+
+def test_optional_step_cannot_happen_after_a_later_step():
+    steps = [
+        step("view_cart", {}, id="view"),
+        step("search_products", {}, id="search", after=["view"], optional=True),
+        step("add_to_cart", {"product_name": "iPhone 15"}, after=["view", "search"]),
+    ]
+    assert not matches(steps, [VIEW, ADD_IPHONE, SEARCH])
+
+
+def test_optional_steps_in_a_sequence():
+    steps = [step("add_to_cart"), step("add_to_cart", optional=True), step("checkout", {})]
+    assert matches(steps, [ADD_IPHONE, CHECKOUT])
+    assert matches(steps, [ADD_IPHONE, ADD_HEADPHONES, CHECKOUT])
+    assert not matches(steps, [ADD_IPHONE, ADD_HEADPHONES, ADD_IPHONE, CHECKOUT])
+
+
+def test_repeat_step_may_be_made_more_than_once():
+    steps = [step("search_products", {}, repeat=True), step("add_to_cart", {"product_name": "iPhone 15"})]
+    assert matches(steps, [SEARCH, ADD_IPHONE])
+    assert matches(steps, [SEARCH, SEARCH, SEARCH, ADD_IPHONE])
+    assert not matches(steps, [ADD_IPHONE])
+    assert not matches(steps, [SEARCH, ADD_IPHONE, SEARCH])
+
+
+def test_optional_repeat_step():
+    steps = [step("view_cart", {}, optional=True, repeat=True), step("checkout", {})]
+    assert matches(steps, [CHECKOUT])
+    assert matches(steps, [VIEW, VIEW, CHECKOUT])
+
+
+def test_duplicate_id_is_rejected():
+    with pytest.raises(ValueError, match="duplicate step id"):
+        PathMatcher(ExpectedToolPath(name="v", tools=[step("view_cart", id="a"), step("checkout", id="a")]))
+
+
+def test_unknown_after_id_is_rejected():
+    with pytest.raises(ValueError, match="unknown ids"):
+        PathMatcher(ExpectedToolPath(name="v", tools=[step("checkout", after=["missing"])]))
+
+
+def test_ordering_cycle_is_rejected():
+    steps = [step("view_cart", id="a", after=["b"]), step("checkout", id="b", after=["a"])]
+    with pytest.raises(ValueError, match="ordering cycle"):
+        PathMatcher(ExpectedToolPath(name="v", tools=steps))
+
+
+def test_flat_variants_expand_partial_orders():
+    variants = flat_variants(ExpectedToolPath(name="v", tools=EITHER_ORDER))
+    assert [name for name, _ in variants] == ["v#1", "v#2"]
+    orders = [[s.arguments.get("product_name") for s in steps if s.name == "add_to_cart"] for _, steps in variants]
+    assert sorted(orders) == [["Wireless Headphones", "iPhone 15"], ["iPhone 15", "Wireless Headphones"]]
+
+
+def test_flat_variants_keep_plain_variants():
+    steps = [step("view_cart", {}), step("checkout", {})]
+    assert flat_variants(ExpectedToolPath(name="v", tools=steps)) == [("v", steps)]
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from model_test import runner
+from model_test.ratelimit import BackendLimiter, CircuitOpenError, RateLimitConfig, get_limiter
+
+
+class Fatal(Exception):
+    pass
+
+
+class Throttled(Exception):
+    pass
+
+
+def classify(exc):
+    return "fatal" if isinstance(exc, Fatal) else "throttle"
+
+
+def limiter(failure_threshold=3):
+    return BackendLimiter("m", RateLimitConfig(max_retries=0, failure_threshold=failure_threshold))
+
+
+def call(limiter, exc=None):
+    async def fn():
+        if exc is not None:
+            raise exc
+        return "ok"
+
+    return asyncio.run(limiter.call(fn, classify=classify))
+
+
+def test_fatal_errors_do_not_open_the_circuit():
+    lim = limiter()
+    for _ in range(10):
+        with pytest.raises(Fatal):
+            call(lim, Fatal())
+    assert not lim.circuit_open
+    assert call(lim) == "ok"
+
+
+def test_exhausted_retries_open_the_circuit():
+    lim = limiter()
+    for _ in range(3):
+        with pytest.raises(Throttled):
+            call(lim, Throttled())
+    assert lim.circuit_open
+    with pytest.raises(CircuitOpenError, match="after 3 consecutive failures"):
+        call(lim)
+
+
+def test_success_resets_the_failure_count():
+    lim = limiter()
+    for _ in range(2):
+        with pytest.raises(Throttled):
+            call(lim, Throttled())
+    call(lim)
+    with pytest.raises(Throttled):
+        call(lim, Throttled())
+    assert not lim.circuit_open
+
+
+def test_models_get_their_own_limiter():
+    healthy = get_limiter("fake-bedrock/test-healthy", RateLimitConfig(failure_threshold=1))
+    broken = get_limiter("fake-bedrock/test-broken", RateLimitConfig(failure_threshold=1))
+    assert healthy is not broken
+    assert get_limiter("fake-bedrock/test-healthy") is healthy
+
+
+def test_swept_models_on_one_backend_do_not_share_a_concurrency_limit():
+    config = RateLimitConfig(max_concurrency=4)
+    a = runner.TestRunner("", "", "fake-bedrock/sweep-a", rate_limit=config)
+    b = runner.TestRunner("", "", "fake-bedrock/sweep-b", rate_limit=config)
+    a.limiter.limit = 1  # a throttled model backs off on its own
+    assert a.limiter is not b.limiter
+    assert b.limiter.limit == 4
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from model_test import runner
+from model_test.fakeserver import FakeProfile
+from model_test.main import build_report, load_test_cases, run_test_cases_async, save_results
+from model_test.models import AgentBudget
+from model_test.pricing import ModelPrice
+
+PRICE = ModelPrice(input=1.0, output=2.0)
+
+
+def run(test_case_name, budget):
+    test_runner = runner.TestRunner("", "", "fake-bedrock/report-test")
+    test_runner.budget = budget
+    test_cases = load_test_cases("config/test_cases.json", test_case_name)
+    results = asyncio.run(run_test_cases_async(test_runner, test_cases))
+    return results, build_report(results, wall_time=1.0, concurrency=1, price=PRICE)
+
+
+def test_test_stopped_early_counts_towards_usage_and_cost():
+    results, report = run("complex_shopping_workflow", AgentBudget(max_rounds=2))
+    result = results[0]
+    assert result.stop_reason == "max_rounds"
+    assert result.response is not None
+    assert result.response.llm_requests == 2
+    assert len(result.response.tool_calls) == 2
+    assert result.response.usage.prompt_tokens > 0
+    assert report.usage.prompt_tokens == result.response.usage.prompt_tokens
+    assert report.total_llm_time == result.response.llm_total_time
+    assert result.cost is not None and result.cost > 0
+    assert report.total_cost == result.cost
+
+
+def test_api_error_keeps_the_rounds_run_before_it(monkeypatch):
+    test_runner = runner.TestRunner("", "", "fake-bedrock/report-error-test")
+    test_cases = load_test_cases("config/test_cases.json", "complex_shopping_workflow")
+    converse = test_runner.client.client.converse
+    calls = []
+
+    def fail_second_round(**kwargs):
+        calls.append(kwargs)
+        if len(calls) > 1:
+            raise ValueError("connection dropped")
+        return converse(**kwargs)
+
+    monkeypatch.setattr(test_runner.client.client, "converse", fail_second_round)
+    results = asyncio.run(run_test_cases_async(test_runner, test_cases))
+    report = build_report(results, wall_time=1.0, concurrency=1, price=PRICE)
+    result = results[0]
+    assert result.stop_reason == "error"
+    assert result.response.llm_requests == 1
+    assert report.usage.prompt_tokens == result.response.usage.prompt_tokens > 0
+    assert report.total_cost == result.cost > 0
+
+
+def test_loop_stop_records_the_repeated_calls(tmp_path):
+    config = tmp_path / "cases.json"
+    search = {"name": "search_products", "arguments": {"query": "headphones"}}
+    config.write_text(json.dumps([{
+        "name": "loops",
+        "prompt": "Find me headphones",
+        "expected_tools_variants": [{"name": "v", "tools": [search] * 5}],
+    }]))
+    profile = FakeProfile(test_cases=str(config))
+    test_runner = runner.TestRunner("", "", "fake-bedrock/report-loop-test", fake_profile=profile)
+    results = asyncio.run(run_test_cases_async(test_runner, load_test_cases(str(config))))
+    output = tmp_path / "results.json"
+    save_results(build_report(results, wall_time=1.0, concurrency=1), str(output))
+
+    saved = json.loads(output.read_text())["results"][0]
+    assert saved["stop_reason"] == "loop"
+    assert saved["response"]["stop_reason"] == "loop"
+    assert saved["response"]["tool_calls"] == [{"name": "search_products", "args": {"query": "headphones"}}] * 3
+    assert len(saved["response"]["rounds"]) == 3